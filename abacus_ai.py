@@ -3,15 +3,16 @@ import requests
 from dotenv import load_dotenv
 import os
 
+from config import require_env
+
 load_dotenv()  # Load variables from .env
 
+# Checked when send_to_abacus is called
 ABACUS_API_KEY = os.getenv("ABACUS_API_KEY")
-if not ABACUS_API_KEY:
-    raise ValueError("ABACUS_API_KEY environment variable is not set. Please set it in your .env file.")
-
 MODEL_ID = os.getenv("MODEL_ID")
-if not MODEL_ID:
-    raise ValueError("MODEL_ID environment variable is not set. Please set it in your .env file.")
+
+# One HTTP session for every call so connections are kept alive
+session = requests.Session()
 
 # Example PageSpeed results
 pagespeed_results = [
@@ -53,18 +54,18 @@ Raw PageSpeed Data:
 """
     return intro + json.dumps(pagespeed_results, indent=2)
 
-def send_to_abacus(prompt):
+def send_to_abacus(prompt, timeout=120):
     url = "https://api.abacus.ai/v1/deployTextGenerationModel"
     payload = {
-        "apiKey": ABACUS_API_KEY,
-        "modelDeploymentId": MODEL_ID,
+        "apiKey": require_env("ABACUS_API_KEY"),
+        "modelDeploymentId": require_env("MODEL_ID"),
         "prompt": prompt,
         "temperature": 0.7,
         "maxTokens": 1500,
         "topP": 0.9
     }
 
-    response = requests.post(url, json=payload)
+    response = session.post(url, json=payload, timeout=timeout)
     if response.ok:
         result = response.json()
         return result.get("generatedText", "No text generated.")
@@ -0,0 +1,106 @@
+import os
+from collections import Counter
+from urllib.parse import urlparse, urljoin
+from dotenv import load_dotenv
+
+load_dotenv()  # Load variables from .env
+
+# Representative examples kept per issue class.
+SAMPLES_PER_ISSUE = int(os.getenv("CANONICAL_SAMPLES_PER_ISSUE", "5"))
+# Canonical targets shared by the most URLs, listed in the summary.
+TOP_TARGETS = 10
+
+ISSUE_CLASSES = ["self_canonical", "missing", "cross_url", "non_200", "parameterized"]
+
+
+def _normalize(url):
+    """Compare URLs ignoring scheme case, www., trailing slash and fragment."""
+    if not url:
+        return url
+    parts = urlparse(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{host}{path}{query}"
+
+
+def classify(item: dict) -> list:
+    """
+    Issue classes for one {"url", "url_status_code", "canonical_url"} record.
+    A record can be in several classes (e.g. cross_url and parameterized).
+    """
+    url = item.get("url")
+    canonical = item.get("canonical_url")
+    status = item.get("url_status_code")
+    classes = []
+
+    if status != 200:
+        classes.append("non_200")
+
+    if not canonical:
+        classes.append("missing")
+        return classes
+
+    absolute = urljoin(url, canonical)
+    if _normalize(absolute) == _normalize(url):
+        classes.append("self_canonical")
+    else:
+        classes.append("cross_url")
+
+    if urlparse(absolute).query:
+        classes.append("parameterized")
+
+    return classes
+
+
+def summarize_canonicals(items: list) -> dict:
+    """
+    Aggregate crawled URL/canonical pairs into counts and a few samples per issue class.
+    """
+    counts = Counter()
+    samples = {issue: [] for issue in ISSUE_CLASSES}
+    status_codes = Counter()
+    targets = Counter()
+
+    for item in items:
+        counts["total"] += 1
+        status_codes[str(item.get("url_status_code"))] += 1
+        if item.get("canonical_url"):
+            targets[urljoin(item.get("url"), item["canonical_url"])] += 1
+
+        for issue in classify(item):
+            counts[issue] += 1
+            if len(samples[issue]) < SAMPLES_PER_ISSUE and issue != "self_canonical":
+                samples[issue].append({
+                    "url": item.get("url"),
+                    "status": item.get("url_status_code"),
+                    "canonical": item.get("canonical_url"),
+                })
+    # End for loop
+
+    return {
+        "total_urls": counts["total"],
+        "counts": {issue: counts[issue] for issue in ISSUE_CLASSES},
+        "status_codes": dict(status_codes),
+        "unique_canonicals": len(targets),
+        "most_shared_canonicals": [
+            {"canonical": target, "urls": count}
+            for target, count in targets.most_common(TOP_TARGETS) if count > 1
+        ],
+        "samples": {issue: rows for issue, rows in samples.items() if rows},
+    }
+
+
+def summarize_by_category(categorized: dict) -> dict:
+    """summarize_canonicals() for every sitemap category that has records."""
+    return {
+        category: summarize_canonicals(items)
+        for category, items in categorized.items() if items
+    }
+
+
+def chunk_category(items: list, chunk_size: int) -> list:
+    """Split a category's records into chunks of at most chunk_size for the map step."""
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)] or [[]]
@@ -2,46 +2,21 @@ import json
 import os
 import datetime
 import re
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
 
-from google_studio_ai import generate_report
+from concurrent.futures import ThreadPoolExecutor
 
-def generate_txt_file_report(report, client_name):
-    try:
-        print("generating Text File with Canonical Data")
-        report_dir = "report"
-        os.makedirs(report_dir, exist_ok=True)
-        now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        # Sanitize client_name and url to be valid filenames
-        safe_client_name = re.sub(r'[^A-Za-z0-9_\-]', '_', client_name)
-        filename = f"{safe_client_name}_Canonical_Report_{now}.txt"
-        filepath = os.path.join(report_dir, filename)
-        with open(filepath, "w") as f:
-            f.write(report)
-        return filepath
-    except Exception as e:
-        raise ValueError(f"Unable to generate {filepath}") from e
-
-def generate_canonical_tag_report(urls, canonicals, client_name):
-  
-    print("generating Canonical Tag Report")
-    debug = ""
-
-    with open(f"prompts/holistic_strategy_checks_to_canonical_tagging.md", "r") as f:
-        custom_prompt = f.read()
+from llm_backends import generate_report, generate_report_stream
+from prompt_registry import register_prompt, get_prompt
+from report_writer import stream_report_to_file
+from canonical_summary import summarize_canonicals, summarize_by_category, chunk_category
+from tenants import bind_tenant
 
-    if not custom_prompt:
-        raise ValueError(f"Prompt file for client '{client_name}' is empty or missing.")
+# Optional map step: one short LLM narrative per category chunk before the final report.
+CANONICAL_MAP_REDUCE = os.getenv("CANONICAL_MAP_REDUCE", "").lower() in ("1", "true", "yes")
+CANONICAL_CHUNK_SIZE = int(os.getenv("CANONICAL_CHUNK_SIZE", "500"))
+CANONICAL_MAP_WORKERS = int(os.getenv("CANONICAL_MAP_WORKERS", "3"))
 
-    with open(f"report/example.txt", "r") as fi:
-        example_report = fi.read()
-    
-    if not example_report:
-        example_report = ''
-    
-    prompt = f"""
+CANONICAL_PROMPT_TEMPLATE = """
     You are a technical SEO expert with experience in interpreting the result from crawling all the urls and providing canonical taging.
 
     Make the report specific for the client {client_name}
@@ -61,26 +36,103 @@ def generate_canonical_tag_report(urls, canonicals, client_name):
     
     ## Input:
     --------
-    Below is the raw array of the , structured as JSON. Analyze and use it to create the report.
+    Below is a summary of the crawl, aggregated locally and structured as JSON. "counts" gives the number of URLs
+    per issue class (self_canonical, missing, cross_url, non_200, parameterized), "samples" holds representative
+    URLs per issue class and "most_shared_canonicals" the canonical targets used by the most URLs.
+    Analyze and use it to create the report.
+
+    #### Site-wide summary:
+    {summary}
 
-    #### urls with their canonicals:
-    {json.dumps(urls, indent=2)}
+    #### Summary per sitemap category:
+    {category_summaries}
 
-    #### canonicals url:
-    {json.dumps(canonicals, indent=2)}
+    {narratives_section}
     """
 
+register_prompt("canonical_report", CANONICAL_PROMPT_TEMPLATE, {
+    "custom_prompt": ("prompts/holistic_strategy_checks_to_canonical_tagging.md", True),
+})
+
+def report_filepath(client_name):
+    report_dir = "report"
+    now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Sanitize client_name and url to be valid filenames
+    safe_client_name = re.sub(r'[^A-Za-z0-9_\-]', '_', client_name)
+    filename = f"{safe_client_name}_Canonical_Report_{now}.txt"
+    return os.path.join(report_dir, filename)
+
+def generate_category_narratives(urls, client_name, use_cache=True):
+    """
+    Map step: summarize each category chunk locally and ask the LLM for a short narrative.
+    Returns {category: [narrative, ...]} with one narrative per chunk.
+    """
+    tasks = []
+    for category, items in urls.items():
+        if not items:
+            continue
+        chunks = chunk_category(items, CANONICAL_CHUNK_SIZE)
+        for chunk_no, chunk in enumerate(chunks, start=1):
+            summary = summarize_canonicals(chunk)
+            prompt = f"""
+    You are a technical SEO expert. Below is a summary of canonical tags crawled for the
+    '{category}' section (chunk {chunk_no} of {len(chunks)}) of the client {client_name}.
+    In at most 150 words, describe the canonical tagging issues it shows and their likely SEO impact.
+    Quote the sample URLs where useful. Do not write recommendations.
+
+    {json.dumps(summary, separators=(",", ":"))}
+    """
+            tasks.append((category, prompt))
+
+    with ThreadPoolExecutor(max_workers=CANONICAL_MAP_WORKERS) as pool:
+        texts = list(pool.map(bind_tenant(lambda task: generate_report(task[1], use_cache=use_cache)), tasks))
+
+    narratives = {}
+    for (category, _), text in zip(tasks, texts):
+        narratives.setdefault(category, []).append(text)
+    return narratives
+
+def generate_canonical_tag_report(urls, canonicals, client_name, use_cache=True, map_reduce=None):
+  
+    print("generating Canonical Tag Report")
+    debug = ""
+
+    # Aggregate locally; only the compact summary goes to the LLM
+    all_items = [item for items in urls.values() for item in items]
+    summary = summarize_canonicals(all_items)
+    summary["unique_canonicals"] = len(canonicals)
+    category_summaries = summarize_by_category(urls)
+    print(f"Canonical summary: {summary['counts']} over {summary['total_urls']} URLs")
+
+    if map_reduce is None:
+        map_reduce = CANONICAL_MAP_REDUCE
+
+    narratives_section = ""
+    if map_reduce:
+        narratives = generate_category_narratives(urls, client_name, use_cache=use_cache)
+        narratives_section = "#### Per-category findings:\n" + "\n\n".join(
+            f"##### {category}\n" + "\n".join(texts) for category, texts in narratives.items()
+        )
+
+    prompt = get_prompt("canonical_report", client_name).render(
+        summary=json.dumps(summary, separators=(",", ":")),
+        category_summaries=json.dumps(category_summaries, separators=(",", ":")),
+        narratives_section=narratives_section,
+    )
+
+    # Tokens are written to the report file (and forwarded to SSE listeners) as they arrive
     try:
-        report = generate_report(prompt)   
-    except Exception as e:
-        print(e)
-        raise ValueError(f"LightHouse - Unable to gather analitics")
-    
-    try:
-        file = generate_txt_file_report(report, client_name)
+        file = stream_report_to_file(
+            generate_report_stream(prompt, use_cache=use_cache),
+            report_filepath(client_name),
+            f"{client_name} canonical report",
+        )
+    except LLMBackendError as e:
+        raise ValueError(f"LightHouse - Unable to gather analitics") from e
+    except OSError as e:
+        raise ValueError(f"Text - Unable to create Text file") from e
     except Exception as e:
-        print(e)
-        raise ValueError(f"Text - Unable to create Text file")
+        raise ValueError(f"LightHouse - Unable to gather analitics") from e
 
    # try:
    #     gdoc = txt_to_doc(file, client_name)
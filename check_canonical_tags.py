@@ -3,16 +3,15 @@ from bs4 import BeautifulSoup
 from xml.etree import ElementTree as ET
 from urllib.parse import urlparse
 import os
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
 import datetime
 import json
 from canonical_tag_report import generate_canonical_tag_report
+from concurrency_governor import governed_request, site_endpoint
+from tenants import tenant_sitemap
+from progress import NO_PROGRESS
 
-MAIN_SITEMAP = os.getenv("MAIN_SITEMAP")
-if not MAIN_SITEMAP:
-    raise ValueError("MAIN_SITEMAP environment variable is not set. Please set it in your .env file.")
+# Tab name on progress events
+PROGRESS_TAB = "Crawl & Indexing Optimization"
 
 def preprocess_xml(xml_content):
     print("Fix common XML issues: newlines in tags and unescaped ampersands")
@@ -55,7 +54,7 @@ def categorize_sitemap(sitemap_url):
 def parse_sitemap(sitemap_url):
     print("Parse individual sitemap to extract page URLs")
     try:
-        response = requests.get(sitemap_url, timeout=10)
+        response = governed_request(site_endpoint(sitemap_url), "GET", sitemap_url, timeout=10)
         response.raise_for_status()
         root = ET.fromstring(response.content)
         query = './/{*}loc'
@@ -88,7 +87,7 @@ def categorize_urls(sitemap_urls):
 
     return categorized_urls
 
-def get_canonical_tags(categorized_urls):
+def get_canonical_tags(categorized_urls, progress=NO_PROGRESS):
     print("Loop thru categorized url to get canonical tag")
 
     canonical_data = {category: [] for category in categorized_urls}
@@ -101,13 +100,20 @@ def get_canonical_tags(categorized_urls):
         i = 0
         x = 0
         y = x + 2000
+        progress.add_total(len(urls[x:y]), PROGRESS_TAB)
         for url in urls:
             if i < x:
                 i = i + 1
                 continue
             if urls.index(url) % 100 == 0:
                 print(f"Processed {urls.index(url)} URLs in category '{category}'")
+            progress.stage(url, "canonical", PROGRESS_TAB)
             result = get_canonical(url)
+            if result:
+                progress.item_done(url, PROGRESS_TAB)
+            else:
+                progress.item_done(url, PROGRESS_TAB, error="Unable to fetch the page")
+            result = result or {"href": None, "status_code": None}
             #print(result)
             canonical_data[category].append({"url": url, "url_status_code": result['status_code'], "canonical_url": result['href']})
             i = i + 1
@@ -119,7 +125,7 @@ def get_canonical(url):
     #print(f"Retrieve canonical link from a webpage: {url}")
     try:
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=20)
+        response = governed_request(site_endpoint(url), "GET", url, headers=headers, timeout=20)
         soup = BeautifulSoup(response.text, 'html.parser')
         status_code = response.status_code
         canonical = soup.find('link', rel='canonical')
@@ -142,6 +148,34 @@ def get_canonical_info(categorized_urls_and_canonicals_tags):
 
     return unique_canonicals
 
+def canonical_issue(url, status_code, canonical_url):
+    """Short description of what is wrong with a page's canonical tag ('' when nothing is)."""
+    if status_code is None:
+        return "fetch failed"
+    if status_code != 200:
+        return f"HTTP {status_code}"
+    if not canonical_url:
+        return "missing"
+    if canonical_url.rstrip('/') != url.rstrip('/'):
+        return "points elsewhere"
+    return ""
+
+def canonical_rows(categorized_urls_and_canonicals_tags):
+    """Flatten the categorized results into one row per page, for the local store."""
+    audit_date = datetime.datetime.today().strftime('%m/%d/%Y')
+    return [
+        {
+            "url": item["url"],
+            "category": category,
+            "status_code": item["url_status_code"],
+            "canonical_url": item["canonical_url"],
+            "issue": canonical_issue(item["url"], item["url_status_code"], item["canonical_url"]),
+            "audit_date": audit_date,
+        }
+        for category, items in categorized_urls_and_canonicals_tags.items()
+        for item in items
+    ]
+
 def save_to_file(categorized_urls_and_canonicals_tags, canonical_tags):
     
     try:
@@ -174,11 +208,12 @@ def save_to_file(categorized_urls_and_canonicals_tags, canonical_tags):
         print(f"Error Dumping {e}")
         return None
     
-def check_canonical_tags():
-    print("Check canonical tags")
+def check_canonical_tags(client_name, progress=NO_PROGRESS):
+    print(f"Check canonical tags for {client_name}")
   
-    print(f"Main SiteMap URLS: {MAIN_SITEMAP}")
-    response = requests.get(MAIN_SITEMAP, timeout=10)
+    main_sitemap = tenant_sitemap(client_name)
+    print(f"Main SiteMap URLS: {main_sitemap}")
+    response = governed_request(site_endpoint(main_sitemap), "GET", main_sitemap, timeout=10)
     sitemap_index_xml = response.text
     print(sitemap_index_xml)
 
@@ -188,15 +223,19 @@ def check_canonical_tags():
 
     categorized_urls = categorize_urls(sitemap_urls)
    
-    categorized_urls_and_canonicals_tags = get_canonical_tags(categorized_urls)
+    categorized_urls_and_canonicals_tags = get_canonical_tags(categorized_urls, progress)
     
     canonical_tags = get_canonical_info(categorized_urls_and_canonicals_tags)
 
     file = save_to_file(categorized_urls_and_canonicals_tags, canonical_tags)
 
-    report = generate_canonical_tag_report(categorized_urls_and_canonicals_tags, canonical_tags, 'webeyecare')
+    report = generate_canonical_tag_report(categorized_urls_and_canonicals_tags, canonical_tags, client_name)
 
     if report:
         print('Report Completed')
+        debug = f"Canonical report: {report}\n"
     else:
         print('Unable to create report')
+        debug = "Unable to create canonical report\n"
+
+    return {"report": report, "file": file, "rows": canonical_rows(categorized_urls_and_canonicals_tags), "debug": debug}
@@ -0,0 +1,113 @@
+import os
+import re
+import sys
+import subprocess
+
+# Usage: python check_import_time.py [module ...]
+#
+# Imports each module in a fresh interpreter with `-X importtime` and no API
+# keys in the environment, then checks that:
+#   - the import succeeds (imports have no side effects that need keys or credentials),
+#   - the import creates or changes no file in the repository (no store, cache or log setup),
+#   - none of the heavy client libraries are loaded at import time,
+#   - the cumulative import time stays within IMPORT_BUDGET_MS.
+# Exits non-zero on any violation, so it can run in CI or before a deploy.
+
+MODULES = ["main", "sheet_loader", "jobs", "seo_report", "canonical_tag_report", "report_to_gdoc", "llm_backends"]
+
+# Milliseconds allowed for importing one module, dependencies included.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+# Must only be imported when the feature that needs them runs.
+LAZY_MODULES = ["pandas", "gspread", "gspread_dataframe", "gspread_formatting", "googleapiclient", "google.generativeai", "google.oauth2"]
+
+# Variables removed from the child environment to prove imports do not need them.
+SECRET_VARIABLES = [
+    "GOOGLE_API_KEY", "GOOGLE_MODEL", "PAGE_SPEED_API_KEY", "PAGE_SPEED_API_ENDPOINT",
+    "GOOGLE_SAFE_BROWSING_API_KEY", "MAIN_SITEMAP", "GOOGLE_DRIVE_REPORT_FOLDER",
+    "ABACUS_API_KEY", "MODEL_ID",
+]
+
+# Never compared for changes: bytecode and version control
+IGNORED_DIRECTORIES = {"__pycache__", ".git", ".pytest_cache"}
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def snapshot_files(root: str) -> dict:
+    """Path -> (size, mtime) of every file under root."""
+    files = {}
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories[:] = [name for name in subdirectories if name not in IGNORED_DIRECTORIES]
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files[os.path.relpath(path, root)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def measure(module: str) -> dict:
+    root = os.path.dirname(os.path.abspath(__file__))
+    # A local .env is still read by load_dotenv; CI runs without one
+    env = {key: value for key, value in os.environ.items() if key not in SECRET_VARIABLES}
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    before = snapshot_files(root)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=root,
+    )
+    after = snapshot_files(root)
+    written = sorted(path for path, stat in after.items() if before.get(path) != stat)
+
+    imported = {}
+    for line in completed.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imported[name] = (int(self_us), int(cumulative_us), len(indent))
+
+    error = None
+    if completed.returncode != 0:
+        error = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")][-1:]
+        error = error[0] if error else f"exit code {completed.returncode}"
+
+    return {
+        "module": module,
+        "error": error,
+        "ms": imported.get(module, (0, 0, 0))[1] / 1000,
+        "written": written,
+        "lazy_violations": sorted(name for name in imported if name in LAZY_MODULES),
+        "heaviest": sorted(
+            # Direct imports of the top-level modules
+            ((name, cumulative / 1000) for name, (_, cumulative, indent) in imported.items() if indent == 3),
+            key=lambda item: item[1], reverse=True,
+        )[:5],
+    }
+
+
+if __name__ == "__main__":
+    failed = False
+    for module in sys.argv[1:] or MODULES:
+        result = measure(module)
+        problems = []
+        if result["error"]:
+            problems.append(f"import failed: {result['error']}")
+        if result["written"]:
+            problems.append(f"wrote files: {', '.join(result['written'])}")
+        if result["lazy_violations"]:
+            problems.append(f"loaded eagerly: {', '.join(result['lazy_violations'])}")
+        if result["ms"] > IMPORT_BUDGET_MS:
+            problems.append(f"over budget ({IMPORT_BUDGET_MS:.0f}ms)")
+
+        mark = "✗" if problems else "✓"
+        print(f"{mark} {module}: {result['ms']:.0f}ms")
+        for name, ms in result["heaviest"]:
+            print(f"    {name}: {ms:.0f}ms")
+        for problem in problems:
+            print(f"    {problem}")
+        failed = failed or bool(problems)
+
+    sys.exit(1 if failed else 0)
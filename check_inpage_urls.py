@@ -7,11 +7,18 @@ from check_toxic_links import (
     check_toxic_link_gsb,
     strip_www
 )
+from concurrency_governor import governed_request, site_endpoint
 
-def check_inpage_urls(page_url):
+def check_inpage_urls(page_url, link_status=None):
+    """
+    HEAD-check the links, images and scripts on page_url.
+    link_status: URL -> HTTP status cache shared by the pages of one run. Each
+    URL is requested once, but every page containing a broken link still gets
+    its own result row.
+    """
     results = []
-    global global_checked_url
-    checked_url = global_checked_url
+    if link_status is None:
+        link_status = {}
     
     debug = ''
     print ('### Checking in-page URLs for:', page_url)
@@ -24,7 +31,7 @@ def check_inpage_urls(page_url):
         page_domain = strip_www(page_parts.netloc)
 
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(page_url, headers=headers, timeout=10)
+        response = governed_request(site_endpoint(page_url), "GET", page_url, headers=headers, timeout=10)
         response.raise_for_status()
 
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -64,21 +71,20 @@ def check_inpage_urls(page_url):
                     continue
                 seen.add(abs_url)
 
-                if abs_url in checked_url: continue # Prevents from checking duplicates
-                
-                checked_url.append(abs_url)
-                print(f"Checked URLs so far: {len(checked_url)}")
-                # Check URL status
+                # Check URL status (once per run; later pages reuse it)
                 try:
-
-                    print(f"-- Checking URL: {abs_url} ")
-                    r = requests.head(abs_url, allow_redirects=True, timeout=5)
-                    if r.status_code != 200:
+                    if abs_url not in link_status:
+                        print(f"-- Checking URL: {abs_url} ")
+                        r = governed_request(site_endpoint(abs_url), "HEAD", abs_url, allow_redirects=True, timeout=5)
+                        link_status[abs_url] = r.status_code
+                        print(f"Checked URLs so far: {len(link_status)}")
+                    status_code = link_status[abs_url]
+                    if status_code != 200:
                         results.append({
                             "page_url": page_url,
                             "audit_date": datetime.now(timezone.utc).strftime("%m/%d/%Y"),
                             "in_page_url": abs_url,
-                            "status_code": r.status_code,
+                            "status_code": status_code,
                             "tag": tag,
                             "notes": ''
                         })
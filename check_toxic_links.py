@@ -2,7 +2,9 @@ import requests
 import os
 import json
 from dotenv import load_dotenv
-import sys
+
+from concurrency_governor import governed_request
+from config import require_env
 
 load_dotenv()  # Load variables from .env
 
@@ -15,9 +17,8 @@ load_dotenv()  # Load variables from .env
 # Replace '1.0' with your application's version.
 CLIENT_ID = "larry-toxic-link-checker-script"
 CLIENT_VERSION = "1.0"
+# Checked when a link is looked up
 GOOGLE_API_KEY = os.environ.get("GOOGLE_SAFE_BROWSING_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable is not set. Please set it in your .env file.")
 
 
 # Google Safe Browsing API Endpoint
@@ -66,7 +67,7 @@ def check_toxic_link_gsb(url: str) -> tuple[bool, str | None]:
         }
     }
 
-    params = {"key": GOOGLE_API_KEY}
+    params = {"key": require_env("GOOGLE_SAFE_BROWSING_API_KEY")}
 
     try:
 
@@ -76,7 +77,7 @@ def check_toxic_link_gsb(url: str) -> tuple[bool, str | None]:
         print("--------------------------")
 
         # Send the POST request to the Safe Browsing API
-        response = requests.post(API_URL, params=params, json=payload)
+        response = governed_request("safe_browsing", "POST", API_URL, params=params, json=payload, timeout=20)
 
         # Raise an exception for bad status codes (4xx or 5xx)
         response.raise_for_status()
@@ -96,8 +97,8 @@ def check_toxic_link_gsb(url: str) -> tuple[bool, str | None]:
     except requests.exceptions.RequestException as e:
         # Handle network errors, connection issues, or API errors
         print(f"API Request Error: {e}")
-        sys.exit(1)
         # Check if it's likely an invalid API key error (often 400 or 403)
+        response = e.response
         if response is not None and (response.status_code == 400 or response.status_code == 403):
             return False, f"Possible API Key error or invalid request ({response.status_code})"
         return False, f"Request failed: {e}"
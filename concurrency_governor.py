@@ -0,0 +1,331 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from collections import deque
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+from tenants import current_tenant, fair_share
+
+load_dotenv()  # Load variables from .env
+
+# === CONFIGURATION ===
+# Per-endpoint concurrency bounds: (initial, minimum, maximum).
+# Target sites are keyed as "site:<host>" and all share the "site" bounds.
+ENDPOINT_LIMITS = {
+    "pagespeed": (2, 1, 8),
+    "safe_browsing": (2, 1, 8),
+    "gemini": (2, 1, 6),
+    "abacus": (1, 1, 4),
+    "sheets": (2, 1, 4),
+    "drive": (2, 1, 4),
+    "docs": (2, 1, 4),
+    "site": (2, 1, 10),
+}
+DEFAULT_LIMITS = (1, 1, 4)
+
+# Worker processes sharing the API quotas on this host; each one gets its share
+# of every maximum so the aggregate stays within the limits above.
+GOVERNOR_PROCESSES = max(1, int(os.getenv("GOVERNOR_PROCESSES", os.getenv("WEB_CONCURRENCY", "1"))))
+
+# Status codes that mean "you are going too fast".
+THROTTLE_STATUS_CODES = {429, 503}
+
+# Back off when recent latency grows past this multiple of the baseline.
+LATENCY_TOLERANCE = float(os.getenv("GOVERNOR_LATENCY_TOLERANCE", "2.0"))
+# ...and by at least this many seconds, so sub-second jitter is ignored.
+LATENCY_SLACK = 0.5
+# Back off when the success rate of the recent window drops under this.
+MIN_SUCCESS_RATE = float(os.getenv("GOVERNOR_MIN_SUCCESS_RATE", "0.8"))
+# Multiplicative decrease factor applied on a back-off.
+DECREASE_FACTOR = 0.5
+# Number of recent calls used for the success rate.
+WINDOW_SIZE = 20
+# Number of throttle events kept per endpoint for reporting.
+MAX_THROTTLE_EVENTS = 50
+
+
+def _endpoint_bounds(endpoint: str) -> tuple:
+    """
+    Resolve (initial, minimum, maximum) for an endpoint.
+    GOVERNOR_MAX_<NAME> in the environment overrides the maximum.
+    """
+    family = endpoint.split(":", 1)[0]
+    initial, minimum, maximum = ENDPOINT_LIMITS.get(family, DEFAULT_LIMITS)
+    env_max = os.getenv(f"GOVERNOR_MAX_{family.upper()}")
+    if env_max and env_max.isdigit():
+        maximum = max(minimum, int(env_max))
+    maximum = max(minimum, -(-maximum // GOVERNOR_PROCESSES))
+    initial = min(initial, maximum)
+    return initial, minimum, maximum
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for a single endpoint.
+
+    The limit grows by one after a full "limit" worth of healthy calls and is
+    halved on 429/503, a falling success rate or latency rising past the
+    baseline. Only one decrease is applied per cooldown so a burst of in-flight
+    failures does not collapse the limit to the minimum.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.limit, self.minimum, self.maximum = _endpoint_bounds(name)
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.throttles = 0
+        self.throttle_events = deque(maxlen=MAX_THROTTLE_EVENTS)
+        self._window = deque(maxlen=WINDOW_SIZE)
+        self._healthy_streak = 0
+        self._baseline = None
+        self._recent = None
+        self._last_decrease = 0.0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._tenant_in_flight = {}
+        self._tenant_waiting = {}
+        self.tenant_calls = {}
+
+    def acquire(self, tenant=None):
+        with self._cond:
+            self._tenant_waiting[tenant] = self._tenant_waiting.get(tenant, 0) + 1
+            try:
+                while True:
+                    wait = self._blocked_until - time.monotonic()
+                    if wait <= 0 and self.in_flight < self.limit and self._next_tenant() == tenant:
+                        break
+                    self._cond.wait(timeout=wait if wait > 0 else None)
+            finally:
+                self._tenant_waiting[tenant] -= 1
+                if not self._tenant_waiting[tenant]:
+                    del self._tenant_waiting[tenant]
+            self.in_flight += 1
+            self._tenant_in_flight[tenant] = self._tenant_in_flight.get(tenant, 0) + 1
+            self.tenant_calls[tenant] = self.tenant_calls.get(tenant, 0) + 1
+            # A slot may still be free for the next tenant in line
+            self._cond.notify_all()
+
+    def release(self, tenant=None):
+        with self._cond:
+            self.in_flight -= 1
+            self._tenant_in_flight[tenant] -= 1
+            if not self._tenant_in_flight[tenant]:
+                del self._tenant_in_flight[tenant]
+            self._cond.notify_all()
+
+    def _next_tenant(self):
+        """Waiting tenant with the smallest weighted share of the in-flight calls."""
+        return min(
+            self._tenant_waiting,
+            key=lambda tenant: fair_share(tenant, self._tenant_in_flight.get(tenant, 0)),
+        )
+
+    def record(self, latency: float, status_code=None, ok: bool = True, retry_after=None):
+        """
+        Feed the outcome of one call back into the limiter.
+        """
+        with self._cond:
+            throttled = status_code in THROTTLE_STATUS_CODES
+            ok = ok and not throttled
+            self._window.append(ok)
+
+            if ok:
+                self.successes += 1
+                self._track_latency(latency)
+            else:
+                self.failures += 1
+
+            success_rate = sum(self._window) / len(self._window)
+            slow = (
+                self._baseline is not None
+                and self._recent > self._baseline * LATENCY_TOLERANCE
+                and self._recent - self._baseline > LATENCY_SLACK
+            )
+
+            if throttled:
+                self._decrease(f"HTTP {status_code}", retry_after)
+            elif len(self._window) >= 5 and success_rate < MIN_SUCCESS_RATE:
+                self._decrease(f"success rate {success_rate:.0%}")
+            elif slow:
+                self._decrease(f"latency {self._recent:.2f}s vs baseline {self._baseline:.2f}s")
+            elif ok:
+                self._healthy_streak += 1
+                if self._healthy_streak >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._healthy_streak = 0
+                    self._cond.notify_all()
+
+    def _track_latency(self, latency: float):
+        # Short EWMA for "now", slow-rising floor for the baseline.
+        self._recent = latency if self._recent is None else 0.7 * self._recent + 0.3 * latency
+        if self._baseline is None or latency < self._baseline:
+            self._baseline = latency
+        else:
+            self._baseline = 0.98 * self._baseline + 0.02 * latency
+
+    def _decrease(self, reason: str, retry_after=None):
+        self._healthy_streak = 0
+        now = time.monotonic()
+        cooldown = max(1.0, self._recent or 0.0)
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        old_limit = self.limit
+        self.limit = max(self.minimum, int(self.limit * DECREASE_FACTOR))
+        self.throttles += 1
+        self.throttle_events.append({
+            "time": time.strftime("%H:%M:%S"),
+            "reason": reason,
+            "limit": f"{old_limit} -> {self.limit}",
+        })
+        print(f"⚠️ Governor [{self.name}] backing off ({reason}): limit {old_limit} -> {self.limit}")
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "min": self.minimum,
+                "max": self.maximum,
+                "in_flight": self.in_flight,
+                "successes": self.successes,
+                "failures": self.failures,
+                "throttles": self.throttles,
+                "baseline_latency": round(self._baseline, 3) if self._baseline else None,
+                "recent_latency": round(self._recent, 3) if self._recent else None,
+                "throttle_events": list(self.throttle_events),
+                "tenant_calls": dict(self.tenant_calls),
+            }
+# End AdaptiveLimiter
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(endpoint: str) -> AdaptiveLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(endpoint)
+        if limiter is None:
+            limiter = _limiters[endpoint] = AdaptiveLimiter(endpoint)
+        return limiter
+
+
+def site_endpoint(url: str) -> str:
+    """Governor key for a crawled target site, one limiter per host."""
+    host = urlparse(url).netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"site:{host}"
+
+
+def status_from_exception(exc):
+    """
+    Best-effort HTTP status extraction from client library exceptions
+    (requests, gspread APIError, googleapiclient HttpError, google.api_core).
+    """
+    response = getattr(exc, "response", None)
+    if response is not None and getattr(response, "status_code", None):
+        return response.status_code
+    resp = getattr(exc, "resp", None)
+    if resp is not None and getattr(resp, "status", None):
+        return int(resp.status)
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    return None
+
+
+class _Call:
+    def __init__(self):
+        self.status_code = None
+        self.ok = True
+        self.retry_after = None
+
+    def status(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.ok = status_code is None or status_code < 400
+        self.retry_after = retry_after
+
+
+@contextmanager
+def governed(endpoint: str):
+    """
+    Run one external call under the endpoint's adaptive limit.
+
+        with governed("gemini") as call:
+            response = model.generate_content(prompt)
+
+    Exceptions count as failures (and as throttles when they carry 429/503).
+    Use call.status(code) to report an HTTP status that did not raise.
+    Slots are shared fairly between the tenants of concurrent jobs.
+    """
+    limiter = get_limiter(endpoint)
+    tenant = current_tenant()
+    limiter.acquire(tenant)
+    call = _Call()
+    start = time.monotonic()
+    try:
+        yield call
+    except Exception as e:
+        call.status(status_from_exception(e))
+        call.ok = False
+        raise
+    finally:
+        limiter.release(tenant)
+        limiter.record(time.monotonic() - start, call.status_code, call.ok, call.retry_after)
+
+
+def governed_request(endpoint: str, method: str, url: str, retries: int = 2, **kwargs):
+    """
+    requests.request() under the governor. 429/503 responses are retried
+    (honoring Retry-After) up to `retries` times; the last response is
+    returned so callers keep their own raise_for_status() handling.
+    """
+    import requests
+
+    for attempt in range(retries + 1):
+        with governed(endpoint) as call:
+            response = requests.request(method, url, **kwargs)
+            retry_after = _retry_after(response)
+            call.status(response.status_code, retry_after)
+        if response.status_code not in THROTTLE_STATUS_CODES or attempt == retries:
+            return response
+        time.sleep(retry_after or 2 ** attempt)
+    return response
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    if value and value.isdigit():
+        return min(int(value), 120)
+    return None
+
+
+def governor_report() -> dict:
+    """Current limits, counters and throttle events for every endpoint seen so far."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.snapshot() for limiter in limiters}
+
+
+def format_governor_report() -> str:
+    """Human-readable governor report for the debug output."""
+    lines = ["Concurrency governor:"]
+    for name, stats in sorted(governor_report().items()):
+        lines.append(
+            f"  {name}: limit {stats['limit']} (min {stats['min']}, max {stats['max']}), "
+            f"ok {stats['successes']}, failed {stats['failures']}, throttled {stats['throttles']}"
+        )
+        if len(stats["tenant_calls"]) > 1:
+            shares = ", ".join(f"{tenant or 'none'} {calls}" for tenant, calls in sorted(
+                stats["tenant_calls"].items(), key=lambda item: str(item[0])))
+            lines.append(f"    calls per client: {shares}")
+        for event in stats["throttle_events"]:
+            lines.append(f"    {event['time']} {event['reason']} ({event['limit']})")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,16 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()  # Load variables from .env
+
+
+def require_env(name: str) -> str:
+    """
+    Value of a required environment variable. Called by the feature that
+    needs it, on use, so a missing key only breaks that feature and never
+    an import.
+    """
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(f"{name} environment variable is not set. Please set it in your .env file.")
+    return value
@@ -0,0 +1,109 @@
+import json
+import queue
+import asyncio
+import threading
+
+# Seconds between keep-alive comments on an idle Server-Sent Events stream.
+SSE_KEEPALIVE = 15
+# Seconds between checks of a subscriber's queue for new events.
+SSE_POLL_INTERVAL = 0.2
+# Events buffered per subscriber before the oldest are dropped.
+SUBSCRIBER_BUFFER = 1000
+
+
+class EventHub:
+    """
+    In-process publish/subscribe hub. Pipeline threads publish events on a
+    channel; each subscriber (e.g. an SSE connection) gets its own queue.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel: str, subscriber: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+    def has_subscribers(self, channel: str) -> bool:
+        with self._lock:
+            return bool(self._subscribers.get(channel))
+
+    def publish(self, channel: str, event: str, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, []))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                # Slow consumer: drop its oldest event rather than block the pipeline
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait((event, data))
+                except (queue.Empty, queue.Full):
+                    pass
+# End EventHub
+
+
+hub = EventHub()
+
+
+def sse_format(event: str, data) -> str:
+    payload = data if isinstance(data, str) else json.dumps(data)
+    lines = "".join(f"data: {line}\n" for line in payload.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+async def sse_events(channel: str, request=None, initial=None, subscriber=None):
+    """
+    Async generator of Server-Sent Events for one channel, for use with
+    StreamingResponse(..., media_type="text/event-stream"). Stops when the
+    client disconnects or a "done" event is published. `initial` is a list of
+    (event, data) sent first, e.g. the current state for a late subscriber.
+    Pass a `subscriber` from hub.subscribe() taken before reading that state,
+    so no event published in between is lost; otherwise the generator
+    subscribes when it first runs.
+    """
+    if subscriber is None:
+        subscriber = hub.subscribe(channel)
+    for event, data in initial or []:
+        yield sse_format(event, data)
+        if event == "done":
+            hub.unsubscribe(channel, subscriber)
+            return
+    loop = asyncio.get_running_loop()
+
+    async def next_event():
+        # Polls instead of blocking a thread per connected client
+        deadline = loop.time() + SSE_KEEPALIVE
+        while loop.time() < deadline:
+            try:
+                return subscriber.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(SSE_POLL_INTERVAL)
+        return None
+
+    try:
+        while True:
+            if request is not None and await request.is_disconnected():
+                break
+            item = await next_event()
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event, data = item
+            yield sse_format(event, data)
+            if event == "done":
+                break
+    finally:
+        hub.unsubscribe(channel, subscriber)
@@ -0,0 +1,112 @@
+import os
+import datetime
+from dotenv import load_dotenv
+
+load_dotenv()  # Load variables from .env
+
+# === CONFIGURATION ===
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1").lower() in ("1", "true", "yes")
+# Every Lighthouse category (mobile and desktop) must score at least this.
+FAST_PATH_MIN_SCORE = int(os.getenv("FAST_PATH_MIN_SCORE", "90"))
+# No single opportunity may promise more than this estimated saving.
+FAST_PATH_MAX_SAVINGS_MS = int(os.getenv("FAST_PATH_MAX_SAVINGS_MS", "300"))
+
+CATEGORIES = [
+    ("performance", "Performance"),
+    ("accessibility", "Accessibility"),
+    ("best_practices", "Best Practices"),
+    ("seo", "SEO"),
+]
+
+METRICS = [
+    ("first_contentful_paint", "First Contentful Paint (FCP)"),
+    ("largest_contentful_paint", "Largest Contentful Paint (LCP)"),
+    ("total_blocking_time", "Total Blocking Time (TBT)"),
+    ("cumulative_layout_shift", "Cumulative Layout Shift (CLS)"),
+    ("speed_index", "Speed Index"),
+]
+
+# Max opportunities listed as recommendations in a fast-path report.
+MAX_RECOMMENDATIONS = 5
+
+
+def _strategies(data: dict) -> list:
+    """[("Mobile", result), ("Desktop", result)] for the before_* or after_* pair."""
+    stage = "after" if "after_mobile" in data else "before"
+    return [
+        ("Mobile", data.get(f"{stage}_mobile") or {}),
+        ("Desktop", data.get(f"{stage}_desktop") or {}),
+    ]
+
+
+def _savings_ms(opportunity: dict) -> float:
+    return (opportunity.get("details") or {}).get("overallSavingsMs") or 0
+
+
+def is_healthy(data: dict, min_score: int = None, max_savings_ms: int = None) -> bool:
+    """
+    True when the page needs no LLM analysis: both strategies measured,
+    Core Web Vitals PASS, every category at or above min_score and no
+    opportunity worth more than max_savings_ms.
+    """
+    min_score = FAST_PATH_MIN_SCORE if min_score is None else min_score
+    max_savings_ms = FAST_PATH_MAX_SAVINGS_MS if max_savings_ms is None else max_savings_ms
+
+    for _, result in _strategies(data):
+        if not result or "error" in result:
+            return False
+        if result.get("pass_fail_status") != "PASS":
+            return False
+        if any((result.get(key) or 0) < min_score for key, _ in CATEGORIES):
+            return False
+        if any(_savings_ms(o) > max_savings_ms for o in result.get("opportunities") or []):
+            return False
+    return True
+
+
+def render_fast_report(data: dict, url: str, client_name: str) -> str:
+    """Template report in the same layout as the LLM reports, from PSI metrics only."""
+    today = datetime.date.today().strftime("%B %d, %Y")
+    lines = [f"# {client_name} Performance Audit - {url}", ""]
+
+    for label, result in _strategies(data):
+        lines += [
+            f"## {label} Report",
+            f"*URL: {url}*",
+            "",
+            f"*Date: {today}*",
+            "",
+            f"Core Web Vitals assessment: **{result.get('pass_fail_status')}**. "
+            f"All Lighthouse categories score {FAST_PATH_MIN_SCORE} or higher.",
+            "",
+            "### Performance",
+            f"*   **Performance Score:** {result.get('performance')}",
+        ]
+        for key, name in METRICS:
+            if result.get(key):
+                lines.append(f"*   **{name}:** {result[key]}")
+        lines.append("")
+        for key, name in CATEGORIES[1:]:
+            lines += [f"### {name}", f"*   **{name} Score:** {result.get(key)}", ""]
+
+    lines += ["## Recommendations", ""]
+    seen = set()
+    opportunities = []
+    for _, result in _strategies(data):
+        for opportunity in result.get("opportunities") or []:
+            if opportunity.get("id") not in seen and _savings_ms(opportunity) > 0:
+                seen.add(opportunity.get("id"))
+                opportunities.append(opportunity)
+    opportunities.sort(key=_savings_ms, reverse=True)
+
+    if opportunities:
+        lines.append("The page is healthy. Remaining minor opportunities, by estimated savings:")
+        lines.append("")
+        for opportunity in opportunities[:MAX_RECOMMENDATIONS]:
+            value = f" ({opportunity['displayValue']})" if opportunity.get("displayValue") else ""
+            lines.append(f"*   **{opportunity.get('title')}**{value}")
+    else:
+        lines.append("The page is healthy. No further action is needed; keep monitoring Core Web Vitals.")
+    lines.append("")
+
+    return "\n".join(lines)
@@ -1,27 +1,56 @@
 import json
 import os
-import google.generativeai as genai
+import threading
 from dotenv import load_dotenv
 
-load_dotenv()  # Load variables from .env
+from config import require_env
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable is not set. Please set it in your .env file.")
+load_dotenv()  # Load variables from .env
 
+# Checked (together with GOOGLE_API_KEY) when the model is first used
 GOOGLE_MODEL = os.getenv("GOOGLE_MODEL")
-if not GOOGLE_MODEL:
-    raise ValueError("GOOGLE_MODEL environment variable is not set. Please set it in your .env file.")
 
-# ✅ Set your Gemini API key
-genai.configure(api_key=GOOGLE_API_KEY)
 
+# Generation settings are part of the cache key; keep them here so a change
+# in settings never serves a response produced with the old ones.
+GENERATION_SETTINGS = {}
 
-# 🔁 Send to Gemini and get report
-def generate_report(prompt):
-    model = genai.GenerativeModel(GOOGLE_MODEL)
+_model = None
+_model_lock = threading.Lock()
 
-    response = model.generate_content(prompt)
-    return response.text
 
+def get_model():
+    """The Gemini model client, created once and reused by every call."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            # The SDK is slow to import; only pay for it when Gemini is actually called
+            import google.generativeai as genai
 
+            # ✅ Set your Gemini API key
+            genai.configure(api_key=require_env("GOOGLE_API_KEY"))
+            _model = genai.GenerativeModel(require_env("GOOGLE_MODEL"))
+        return _model
+
+
+# 🔁 Send to Gemini and get report
+def gemini_generate(prompt, timeout=None, stream=False):
+    """
+    Raw Gemini call. Returns the response (an iterator of chunks when stream=True).
+    Callers should go through llm_backends for caching, fallback and accounting.
+    """
+    request_options = {"timeout": timeout} if timeout else None
+    return get_model().generate_content(
+        prompt,
+        generation_config=GENERATION_SETTINGS or None,
+        stream=stream,
+        request_options=request_options,
+    )
+
+
+def usage_tokens(response) -> tuple:
+    """(prompt_tokens, output_tokens) reported by Gemini, or (None, None)."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
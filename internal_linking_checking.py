@@ -3,6 +3,12 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import time
 
+from concurrency_governor import governed_request, site_endpoint
+from progress import NO_PROGRESS
+
+# Tab name on progress events
+PROGRESS_TAB = "Internal Linking Improvements"
+
 # Define a reasonable user agent
 headers = {
     'User-Agent': 'Mozilla/5.0 (compatible; SimpleInternalLinkChecker/1.0; +https://yourwebsite.com/contact)' # Replace with your info if deploying
@@ -39,7 +45,7 @@ def analyze_page_internal_link(url):
     print(f"Analyzing: {url}")
     
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = governed_request(site_endpoint(url), "GET", url, headers=headers, timeout=15)
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
         html_content = response.text
     except requests.exceptions.RequestException as e:
@@ -115,11 +121,18 @@ def analyze_page_internal_link(url):
 
     return {"result": result, "reason": reason, "details": details}
 
-def analyze_page_internal_links(worksheet,urls_to_analyze):
+def analyze_page_internal_links(worksheet,urls_to_analyze, progress=NO_PROGRESS):
+    """
+    Analyze internal linking of every URL.
+    Returns one analyze_page_internal_link result per URL, each with its "url".
+    `progress` receives a "links" stage event and a done event per URL.
+    """
     results = []
     base_url = ""  # Replace with your base URL if needed
+    progress.add_total(len(urls_to_analyze), PROGRESS_TAB)
     for item in urls_to_analyze:
         target_url = item['url']
+        url = target_url
         try:
             if base_url == "":
                 # Extract base URL from the first URL in the list
@@ -133,11 +146,14 @@ def analyze_page_internal_links(worksheet,urls_to_analyze):
             else:
                 url = base_url + '/' + target_url
 
+            progress.stage(url, "links", PROGRESS_TAB)
             result = analyze_page_internal_link(url)
+            progress.item_done(url, PROGRESS_TAB)
 
         except Exception as e:
-                results.append({"result": "Error", "reason": str(e), "details": url})           
+            result = {"result": "Error", "reason": str(e), "details": {}}
+            progress.item_done(url, PROGRESS_TAB, error=e)
 
-        results.append(result)
-    
-    print(results)
\ No newline at end of file
+        results.append(dict(result, url=url))
+
+    return results
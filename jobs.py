@@ -0,0 +1,367 @@
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import sqlite3
+import threading
+import traceback
+from dotenv import load_dotenv
+
+from progress import ProgressTracker, job_channel
+from storage import get_store
+from event_stream import sse_format
+from tenants import tenant_scope, choose_job
+
+load_dotenv()  # Load variables from .env
+
+# === CONFIGURATION ===
+# Sheets processed at the same time by this process; further jobs wait in the queue.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Seconds finished jobs are kept for status and result lookups.
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "86400"))
+# Seconds between heartbeats of running jobs (and progress writes).
+JOB_HEARTBEAT = float(os.getenv("JOB_HEARTBEAT", "10"))
+# A running job without a heartbeat for this long belongs to a dead worker and is re-queued.
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+# Runs attempted before a job that keeps losing its worker is marked as failed.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Seconds an idle job worker waits before looking for queued jobs again.
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+
+# Identifies this process in the shared job table.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+ACTIVE_STATES = ("queued", "running")
+
+JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    sheet_id TEXT NOT NULL,
+    client_name TEXT,
+    status TEXT NOT NULL,
+    progress TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL,
+    owner TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    debug TEXT NOT NULL DEFAULT ''
+);
+-- At most one queued or running job per sheet, across every worker process
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_sheet ON jobs (sheet_id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created);
+"""
+
+
+def _row_to_job(row) -> dict:
+    job = dict(row)
+    job["progress"] = json.loads(job["progress"] or "{}")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobQueue:
+    """
+    /load-sheet runs, queued in the shared SQLite store so several uvicorn
+    workers (or hosts sharing the file) can serve the same jobs.
+
+    Any process can submit; job worker threads in every process claim queued
+    jobs atomically. A second submission for a sheet that is still queued or
+    running returns the existing job (enforced by a unique index, so it holds
+    across processes). Running jobs heartbeat; a job whose worker died is put
+    back in the queue and resumes from the rows the sheet already marks done.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = {}         # job_id -> progress dict, for jobs running in this process
+        self._persisted = {}       # job_id -> monotonic time progress was last written
+        self._threads = []
+        with self._connect() as conn:
+            conn.executescript(JOB_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return get_store().connect()
+
+    def start(self):
+        """Start this process' job workers and the heartbeat / recovery loop (idempotent)."""
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._maintain, name="job-maintenance", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, sheet_id: str, client_name: str) -> tuple:
+        """
+        Returns:
+            tuple: (job dict, created) where created is False for a deduplicated submission.
+        """
+        self.start()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        progress = {"stage": "queued", "tabs_done": 0, "tabs_total": 0, "done": 0, "total": 0, "errors": 0, "eta": None}
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, sheet_id, client_name, status, progress, created) VALUES (?, ?, ?, 'queued', ?, ?)",
+                    (job_id, sheet_id, client_name, json.dumps(progress), now),
+                )
+        except sqlite3.IntegrityError:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE sheet_id = ? AND status IN ('queued', 'running')", (sheet_id,)
+                ).fetchone()
+            if row:
+                return _row_to_job(row), False
+            # The active job finished between the insert and the lookup
+            return self.submit(sheet_id, client_name)
+
+        self._wake.set()
+        return self.get(job_id), True
+
+    def get(self, job_id: str) -> dict:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = _row_to_job(row)
+        with self._lock:
+            if job_id in self._running:
+                # Fresher than the last progress write
+                job["progress"] = dict(self._running[job_id])
+        return job
+
+    def list_jobs(self, limit: int = 100) -> list:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def runs_here(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._running
+
+    def update(self, job_id: str, **fields):
+        progress = fields.pop("progress", None)
+        write_progress = False
+        with self._lock:
+            running = job_id in self._running
+            if progress and running:
+                self._running[job_id].update(progress)
+                now = time.monotonic()
+                # Progress changes on every URL; write it at most once per second
+                if now - self._persisted.get(job_id, 0) >= 1:
+                    self._persisted[job_id] = now
+                    write_progress = True
+                progress = dict(self._running[job_id])
+
+        columns = dict(fields)
+        if "result" in columns:
+            columns["result"] = json.dumps(columns["result"]) if columns["result"] is not None else None
+        if progress and not running:
+            job = self.get(job_id)
+            if job:
+                columns["progress"] = json.dumps(dict(job["progress"], **progress))
+        elif write_progress:
+            columns["progress"] = json.dumps(progress)
+        if not columns:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in columns)} WHERE id = ?",
+                (*columns.values(), job_id),
+            )
+
+    def _claim(self) -> dict:
+        """
+        Atomically move the next queued job to running, owned by this process.
+        The job is picked by tenants.choose_job: client priority, per-client
+        job quota and fair share of the running jobs, then age.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            queued = conn.execute("SELECT id, client_name FROM jobs WHERE status = 'queued' ORDER BY created").fetchall()
+            running = dict(conn.execute(
+                "SELECT client_name, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY client_name"
+            ).fetchall())
+            job_id = choose_job([(row["id"], row["client_name"]) for row in queued], running)
+            if not job_id:
+                conn.rollback()
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, started = ?, heartbeat = ?, attempts = attempts + 1 WHERE id = ?",
+                (WORKER_ID, now, now, job_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return self.get(job_id)
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.OperationalError as e:
+                # Another process holds the write lock; try again shortly
+                print(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                self._wake.wait(timeout=JOB_POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _maintain(self):
+        while True:
+            try:
+                self.recover_stale()
+                self.expire()
+            except sqlite3.Error as e:
+                print(f"Job maintenance failed: {e}")
+            time.sleep(JOB_HEARTBEAT)
+            try:
+                self.heartbeat()
+            except sqlite3.Error as e:
+                print(f"Job heartbeat failed: {e}")
+
+    def heartbeat(self):
+        now = time.time()
+        with self._lock:
+            running = {job_id: json.dumps(progress) for job_id, progress in self._running.items()}
+        if running:
+            with self._connect() as conn:
+                conn.executemany(
+                    "UPDATE jobs SET heartbeat = ?, progress = ? WHERE id = ? AND owner = ?",
+                    [(now, progress, job_id, WORKER_ID) for job_id, progress in running.items()],
+                )
+
+    def recover_stale(self) -> int:
+        """Re-queue running jobs whose worker stopped heartbeating; fail them after JOB_MAX_ATTEMPTS."""
+        # Never shorter than a few heartbeats, or live jobs would be taken over
+        cutoff = time.time() - max(JOB_STALE_AFTER, 3 * JOB_HEARTBEAT)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'error', finished = ?, owner = NULL, "
+                "error = 'The worker running this job stopped ' || attempts || ' times.' "
+                "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                (time.time(), cutoff, JOB_MAX_ATTEMPTS),
+            )
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL WHERE status = 'running' AND heartbeat < ?",
+                (cutoff,),
+            ).rowcount
+        if requeued:
+            print(f"Re-queued {requeued} job(s) from stopped workers")
+            self._wake.set()
+        return requeued
+
+    def expire(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (time.time() - JOB_RETENTION,))
+
+    def _run(self, job: dict):
+        job_id = job["id"]
+        with self._lock:
+            self._running[job_id] = dict(job["progress"], stage="urls")
+        # Per-URL counts and ETA flow into the job's progress as well as onto its event channel
+        tracker = ProgressTracker(job_channel(job_id), on_change=lambda counts: self.update(job_id, progress=counts))
+        status, error, result, debug = "error", None, None, ""
+        try:
+            # Every governed call of the run is accounted to the job's client
+            with tenant_scope(job["client_name"]):
+                result = run_load_sheet_job(job_id, job["sheet_id"], job["client_name"], self, tracker)
+            debug = result.get("debug", "")
+            if "error" in result:
+                error, result = result["error"], None
+            else:
+                status = "done"
+        except Exception as e:
+            error, debug = str(e), traceback.format_exc()
+        finally:
+            with self._lock:
+                progress = self._running.pop(job_id, {})
+                self._persisted.pop(job_id, None)
+            if status == "done":
+                progress["stage"] = "done"
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, result = ?, debug = ?, progress = ?, finished = ?, owner = NULL "
+                    "WHERE id = ? AND owner = ?",
+                    (status, error, json.dumps(result) if result else None, debug, json.dumps(progress),
+                     time.time(), job_id, WORKER_ID),
+                )
+            tracker.on_change = None  # Final state is already stored
+            tracker.finish(status, error)
+# End JobQueue
+
+
+def run_load_sheet_job(job_id: str, sheet_id: str, client_name: str, queue: JobQueue, tracker: ProgressTracker) -> dict:
+    """The work behind POST /load-sheet: read the URL list, then run every tab handler."""
+    from sheet_loader import load_sheet, get_urls
+
+    debug = f"Loading Sheet. Sheet ID: {sheet_id}\n"
+    result = get_urls(sheet_id)
+    debug += result.get("debug", "")
+    urls_to_analyze = result.get("urls", [])
+    if not urls_to_analyze:
+        return {"error": result.get("error") or "No URLs found to analyze.", "debug": debug}
+
+    queue.update(job_id, progress={"stage": "tabs", "urls": len(urls_to_analyze)})
+
+    def on_tab_done(status, done, total):
+        queue.update(job_id, progress={"stage": f"tabs ({status['title']} {status['status']})", "tabs_done": done, "tabs_total": total})
+
+    load_return = load_sheet(sheet_id, urls_to_analyze, client_name, on_tab_done=on_tab_done, progress=tracker)
+    load_return["debug"] = debug + load_return.get("debug", "")
+    print("Sheet data loaded successfully.\n" if "error" not in load_return else f"Load failed: {load_return['error']}\n")
+    return load_return
+
+
+async def job_snapshot_events(job_id: str, request=None, interval: float = 1.0):
+    """
+    Server-Sent Events for a job running in another worker process: its
+    stored state as "snapshot" events whenever it changes, then "done".
+    """
+    loop = asyncio.get_running_loop()
+    last = None
+    while True:
+        if request is not None and await request.is_disconnected():
+            break
+        job = await loop.run_in_executor(None, get_job_queue().get, job_id)
+        if job is None:
+            yield sse_format("done", {"status": "error", "error": "Job not found"})
+            break
+        snapshot = {key: job[key] for key in ("id", "sheet_id", "status", "progress", "error")}
+        if snapshot != last:
+            yield sse_format("snapshot", snapshot)
+            last = snapshot
+        if job["status"] not in ACTIVE_STATES:
+            yield sse_format("done", {"status": job["status"], "error": job["error"]})
+            break
+        await asyncio.sleep(interval)
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """The process' job queue, created (and its table set up) on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
@@ -0,0 +1,267 @@
+import os
+import time
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from dotenv import load_dotenv
+
+from concurrency_governor import governed
+from llm_cache import lookup as cache_lookup, put as cache_put
+
+load_dotenv()  # Load variables from .env
+
+# === CONFIGURATION ===
+# Backends tried in order until one answers, e.g. "gemini,abacus,stub".
+LLM_BACKENDS = [b.strip() for b in os.getenv("LLM_BACKENDS", "gemini").split(",") if b.strip()]
+# Per-call timeout in seconds.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+# Simulated latency of the stub backend, for offline pipeline benchmarks.
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0"))
+
+CHARS_PER_TOKEN = 4
+
+
+class LLMBackendError(RuntimeError):
+    """No backend produced the text. Raised instead of the backends' own
+    exceptions (e.g. requests errors, which are OSErrors) so callers can tell
+    LLM failures from their own file or network errors."""
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class LLMBackend(ABC):
+    """
+    One LLM provider. Subclasses implement complete() and, when the provider
+    supports it, stream(). Both return token counts when the provider reports
+    them; estimates are used otherwise.
+    """
+
+    name = ""
+
+    def model_id(self) -> str:
+        return self.name
+
+    def settings(self) -> dict:
+        """Generation settings; part of the cache key."""
+        return {}
+
+    @abstractmethod
+    def complete(self, prompt: str, timeout: float) -> tuple:
+        """Returns (text, prompt_tokens, output_tokens)."""
+
+    def stream(self, prompt: str, timeout: float, usage: dict):
+        """Yields text chunks; fills usage["prompt_tokens"/"output_tokens"] if known."""
+        text, usage["prompt_tokens"], usage["output_tokens"] = self.complete(prompt, timeout)
+        yield text
+# End LLMBackend
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def model_id(self) -> str:
+        import google_studio_ai
+        return f"gemini:{google_studio_ai.GOOGLE_MODEL}"
+
+    def settings(self) -> dict:
+        import google_studio_ai
+        return google_studio_ai.GENERATION_SETTINGS
+
+    def complete(self, prompt, timeout):
+        import google_studio_ai
+
+        with governed("gemini"):
+            response = google_studio_ai.gemini_generate(prompt, timeout=timeout)
+        return (response.text, *google_studio_ai.usage_tokens(response))
+
+    def stream(self, prompt, timeout, usage):
+        import google_studio_ai
+
+        with governed("gemini"):
+            response = google_studio_ai.gemini_generate(prompt, timeout=timeout, stream=True)
+            for chunk in response:
+                prompt_tokens, output_tokens = google_studio_ai.usage_tokens(chunk)
+                if output_tokens:
+                    usage["prompt_tokens"], usage["output_tokens"] = prompt_tokens, output_tokens
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. only safety metadata)
+                    continue
+                if text:
+                    yield text
+# End GeminiBackend
+
+
+class AbacusBackend(LLMBackend):
+    name = "abacus"
+
+    def model_id(self) -> str:
+        import abacus_ai
+        return f"abacus:{abacus_ai.MODEL_ID}"
+
+    def complete(self, prompt, timeout):
+        import abacus_ai
+
+        with governed("abacus"):
+            text = abacus_ai.send_to_abacus(prompt, timeout=timeout)
+        return text, None, None
+# End AbacusBackend
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic local backend: the same prompt always yields the same
+    report. Used to run and benchmark the pipeline without any API key.
+    """
+
+    name = "stub"
+
+    def complete(self, prompt, timeout):
+        if LLM_STUB_LATENCY:
+            time.sleep(LLM_STUB_LATENCY)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        text = (
+            "# Stub Report\n\n"
+            f"*Prompt digest: {digest[:16]}*\n\n"
+            "## Summary\n"
+            f"- Prompt length: {len(prompt)} characters\n\n"
+            "## Recommendations\n"
+            "- This report was produced by the local stub backend.\n"
+        )
+        return text, None, None
+# End StubBackend
+
+
+BACKENDS = {backend.name: backend for backend in (GeminiBackend(), AbacusBackend(), StubBackend())}
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(name: str, latency: float, prompt: str, text: str, prompt_tokens, output_tokens, ok: bool):
+    with _stats_lock:
+        stats = _stats.setdefault(name, {
+            "calls": 0, "failures": 0, "latency_total": 0.0, "latency_max": 0.0,
+            "prompt_tokens": 0, "output_tokens": 0,
+        })
+        stats["calls"] += 1
+        stats["latency_total"] += latency
+        stats["latency_max"] = max(stats["latency_max"], latency)
+        if not ok:
+            stats["failures"] += 1
+            return
+        stats["prompt_tokens"] += prompt_tokens or estimate_tokens(prompt)
+        stats["output_tokens"] += output_tokens or estimate_tokens(text)
+
+
+def _chain(backends=None) -> list:
+    names = backends or LLM_BACKENDS
+    unknown = [name for name in names if name not in BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown LLM backend(s): {', '.join(unknown)}")
+    return [BACKENDS[name] for name in names]
+
+
+def _primary_key(chain: list) -> tuple:
+    # Cache entries are keyed by the primary backend's model; answers from a
+    # fallback backend are not cached so they never mask the primary later.
+    try:
+        return chain[0].model_id(), chain[0].settings()
+    except Exception as e:
+        # Primary misconfigured (e.g. missing key): still let the fallbacks answer
+        print(f"LLM backend '{chain[0].name}' unavailable: {e}")
+        return chain[0].name, {}
+
+
+def generate_report(prompt, use_cache=True, backends=None, timeout=None):
+    """
+    Generate text with the first backend in the fallback order that answers.
+    Served from the LLM response cache when possible.
+    """
+    chain = _chain(backends)
+    model, settings = _primary_key(chain)
+    key, text = cache_lookup(model, prompt, settings, use_cache)
+    if text is not None:
+        return text
+
+    errors = []
+    for backend in chain:
+        start = time.monotonic()
+        try:
+            text, prompt_tokens, output_tokens = backend.complete(prompt, timeout or LLM_TIMEOUT)
+        except Exception as e:
+            _record(backend.name, time.monotonic() - start, prompt, None, None, None, ok=False)
+            print(f"LLM backend '{backend.name}' failed: {e}")
+            errors.append(f"{backend.name}: {e}")
+            continue
+        _record(backend.name, time.monotonic() - start, prompt, text, prompt_tokens, output_tokens, ok=True)
+        if text and backend is chain[0]:
+            cache_put(key, text, model)
+        return text
+
+    raise LLMBackendError(f"All LLM backends failed: {'; '.join(errors)}")
+
+
+def generate_report_stream(prompt, use_cache=True, backends=None, timeout=None):
+    """
+    Stream text chunks from the first backend that answers. Falling back is
+    only possible before the first chunk has been yielded.
+    """
+    chain = _chain(backends)
+    model, settings = _primary_key(chain)
+    key, text = cache_lookup(model, prompt, settings, use_cache)
+    if text is not None:
+        yield text
+        return
+
+    errors = []
+    for backend in chain:
+        start = time.monotonic()
+        usage = {"prompt_tokens": None, "output_tokens": None}
+        parts = []
+        try:
+            for chunk in backend.stream(prompt, timeout or LLM_TIMEOUT, usage):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            _record(backend.name, time.monotonic() - start, prompt, None, None, None, ok=False)
+            print(f"LLM backend '{backend.name}' failed: {e}")
+            if parts:
+                raise LLMBackendError(f"{backend.name} failed mid-stream: {e}") from e
+            errors.append(f"{backend.name}: {e}")
+            continue
+
+        text = "".join(parts)
+        _record(backend.name, time.monotonic() - start, prompt, text, usage["prompt_tokens"], usage["output_tokens"], ok=True)
+        if text and backend is chain[0]:
+            cache_put(key, text, model)
+        return
+
+    raise LLMBackendError(f"All LLM backends failed: {'; '.join(errors)}")
+
+
+def backend_stats() -> dict:
+    """Per-backend calls, failures, latency and token totals for this process."""
+    with _stats_lock:
+        stats = {name: dict(values) for name, values in _stats.items()}
+    for values in stats.values():
+        answered = values["calls"] - values["failures"]
+        values["latency_avg"] = round(values["latency_total"] / values["calls"], 3) if values["calls"] else None
+        values["latency_total"] = round(values["latency_total"], 3)
+        values["latency_max"] = round(values["latency_max"], 3)
+        values["answered"] = answered
+    return stats
+
+
+def format_backend_stats() -> str:
+    lines = ["LLM backends:"]
+    for name, values in sorted(backend_stats().items()):
+        lines.append(
+            f"  {name}: {values['answered']}/{values['calls']} answered, "
+            f"avg {values['latency_avg']}s, max {values['latency_max']}s, "
+            f"tokens in {values['prompt_tokens']} / out {values['output_tokens']}"
+        )
+    return "\n".join(lines) + "\n"
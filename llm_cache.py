@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()  # Load variables from .env
+
+# === CONFIGURATION ===
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join("cache", "llm"))
+# Seconds a cached response stays valid (default 7 days).
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Maximum number of cached responses kept on disk; least recently used go first.
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+# Set to 1/true to skip the cache for every call.
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+_metrics = {"hits": 0, "misses": 0, "bypassed": 0, "expired": 0, "evicted": 0, "stored": 0}
+_lock = threading.Lock()
+
+
+def cache_key(model: str, prompt: str, settings: dict = None) -> str:
+    """Content address of one LLM call: sha256 of (model, prompt, generation settings)."""
+    material = json.dumps(
+        {"model": model, "prompt": prompt, "settings": settings or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(LLM_CACHE_DIR, f"{key}.json")
+
+
+def _count(metric: str):
+    with _lock:
+        _metrics[metric] += 1
+
+
+def get(key: str):
+    """Return the cached response text for `key`, or None on a miss or expired entry."""
+    path = _path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        _count("misses")
+        return None
+
+    if time.time() - entry.get("created", 0) > LLM_CACHE_TTL:
+        _count("expired")
+        _count("misses")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    # Touch so eviction drops the least recently used entries first
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    _count("hits")
+    return entry.get("text")
+
+
+def put(key: str, text: str, model: str = ""):
+    """Store a response atomically, then evict down to LLM_CACHE_MAX_ENTRIES."""
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": model, "created": time.time(), "text": text}, f, ensure_ascii=False)
+        os.replace(tmp_path, _path(key))
+        _count("stored")
+        _evict()
+    except OSError as e:
+        # A broken cache must never break report generation
+        print(f"LLM cache write failed: {e}")
+
+
+def _evict():
+    try:
+        entries = [
+            os.path.join(LLM_CACHE_DIR, name)
+            for name in os.listdir(LLM_CACHE_DIR) if name.endswith(".json")
+        ]
+    except OSError:
+        return
+    overflow = len(entries) - LLM_CACHE_MAX_ENTRIES
+    if overflow <= 0:
+        return
+    entries.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+    for path in entries[:overflow]:
+        try:
+            os.remove(path)
+            _count("evicted")
+        except OSError:
+            pass
+
+
+def lookup(model: str, prompt: str, settings: dict, use_cache: bool = True) -> tuple:
+    """
+    Returns (key, text). text is None on a miss or when the cache is bypassed
+    (use_cache=False or LLM_CACHE_BYPASS); the key is still returned so the
+    fresh response can be stored.
+    """
+    key = cache_key(model, prompt, settings)
+    if not use_cache or LLM_CACHE_BYPASS:
+        _count("bypassed")
+        return key, None
+    text = get(key)
+    if text is not None:
+        print(f"LLM cache hit: {key[:12]}")
+    return key, text
+
+
+def cached_call(model: str, prompt: str, settings: dict, call, use_cache: bool = True) -> str:
+    """
+    Return the cached response for (model, prompt, settings) or run `call()` and cache it.
+    use_cache=False (or LLM_CACHE_BYPASS) skips the lookup but still refreshes the entry.
+    """
+    key, text = lookup(model, prompt, settings, use_cache)
+    if text is not None:
+        return text
+
+    text = call()
+    if text:
+        put(key, text, model)
+    return text
+
+
+def cache_metrics() -> dict:
+    with _lock:
+        metrics = dict(_metrics)
+    lookups = metrics["hits"] + metrics["misses"]
+    metrics["hit_rate"] = round(metrics["hits"] / lookups, 3) if lookups else None
+    return metrics
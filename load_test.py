@@ -0,0 +1,62 @@
+import sys
+import time
+import threading
+import statistics
+import urllib.request
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+# Usage: python load_test.py [base_url] [users] [requests_per_user] [sheet_id]
+#
+# Simulates concurrent users hitting the light pages while, optionally, sheet
+# runs are submitted. With every blocking call off the event loop, latency of
+# "/" and the static files stays flat no matter what the job workers are doing.
+
+BASE_URL = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:8000"
+USERS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+REQUESTS_PER_USER = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+SHEET_ID = sys.argv[4] if len(sys.argv) > 4 else ""
+
+PATHS = ["/", "/load-sheet", "/jobs"]
+
+latencies = []
+errors = []
+lock = threading.Lock()
+
+
+def fetch(path: str, data: bytes = None):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(BASE_URL + path, data=data, timeout=30) as response:
+            response.read()
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+    except Exception as e:
+        with lock:
+            errors.append(f"{path}: {e}")
+
+
+def user(n: int):
+    if SHEET_ID and n % 10 == 0:
+        # Every tenth user also submits the sheet; duplicates attach to the running job
+        fetch("/load-sheet", urllib.parse.urlencode({"sheet_id": SHEET_ID}).encode())
+    for i in range(REQUESTS_PER_USER):
+        fetch(PATHS[(n + i) % len(PATHS)])
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=USERS) as pool:
+        list(pool.map(user, range(USERS)))
+    wall = time.perf_counter() - started
+
+    if latencies:
+        ordered = sorted(latencies)
+        print(f"{len(latencies)} requests from {USERS} users in {wall:.2f}s ({len(latencies) / wall:.0f} req/s)")
+        print(f"p50 {statistics.median(ordered) * 1000:.0f}ms  "
+              f"p95 {ordered[int(len(ordered) * 0.95) - 1] * 1000:.0f}ms  "
+              f"max {ordered[-1] * 1000:.0f}ms")
+    print(f"{len(errors)} errors")
+    for error in errors[:10]:
+        print(f"  {error}")
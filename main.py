@@ -1,24 +1,37 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi.responses import HTMLResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import pandas as pd
+from starlette.concurrency import run_in_threadpool
+import anyio
 from dotenv import load_dotenv
 import os
+import json
+import hashlib
+from html import escape
 
 # from sheet_processer import process_sheet
-from sheet_loader import load_sheet, get_urls
+from jobs import get_job_queue, job_snapshot_events
+from prompt_registry import preload_prompts, PROMPT_CLIENTS
+from event_stream import sse_events, hub
+from report_writer import REPORTS_CHANNEL
+from progress import job_channel
+from storage import get_store, RESULT_VIEWS
 
 
 load_dotenv()  # Load variables from .env
 
-global debug
-global client_name
-debug = "Executing Main Script...\n"
-client_name = 'webeyecare'
+# Client whose prompts are used when a request does not name one
+DEFAULT_CLIENT = os.getenv("DEFAULT_CLIENT", "webeyecare")
 
 # Replace with your actual Google API key
 
+# Rows per dashboard page unless ?page_size= says otherwise (capped at 500 by the store)
+RESULTS_PAGE_SIZE = int(os.getenv("RESULTS_PAGE_SIZE", "50"))
+
+# Threads available to blocking work dispatched from request handlers (anyio's default is 40)
+HTTP_THREADPOOL_SIZE = int(os.getenv("HTTP_THREADPOOL_SIZE", "40"))
+
 app = FastAPI()
 
 # Static files (optional)
@@ -27,6 +40,28 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Templates
 templates = Jinja2Templates(directory="templates")
 
+@app.on_event("startup")
+async def size_threadpool():
+    # Handlers never block the event loop: sync work goes through run_in_threadpool,
+    # long runs go to the job workers. This sizes the pool the former share.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = HTTP_THREADPOOL_SIZE
+# End size_threadpool
+
+@app.on_event("startup")
+async def start_job_workers():
+    # Every uvicorn worker claims jobs from the shared store; this also
+    # re-queues jobs left running by a worker that crashed
+    job_queue = await run_in_threadpool(get_job_queue)
+    await run_in_threadpool(job_queue.start)
+# End start_job_workers
+
+@app.on_event("startup")
+async def load_prompts():
+    # Compile every client prompt up front; a missing prompt file stops the server here
+    # instead of failing halfway through a run.
+    await run_in_threadpool(preload_prompts)
+# End load_prompts
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request, "message": "Welcome to the SEO Analyzer!"})
@@ -34,47 +69,34 @@ async def home(request: Request):
 
 @app.get("/load-sheet", response_class=HTMLResponse)            
 async def load_sheet_form(request: Request):
-    return templates.TemplateResponse("load_sheet.html", {"request": request, "stage": "before", "error": None})
+    return templates.TemplateResponse("load_sheet.html", {
+        "request": request,
+        "stage": "before",
+        "clients": PROMPT_CLIENTS,
+        "error": None
+    })
 # End load_sheet_form_before
 
 @app.post("/load-sheet", response_class=HTMLResponse)
-async def load_sheet_post(request: Request, sheet_id: str = Form(...)):
-    global client_name
-    debug = f"Loading Sheet. Sheet ID: {sheet_id}\n"
-    if not sheet_id:
-        return templates.TemplateResponse("load_sheet.html", {
-            "request": request,
-            "error": "Sheet ID is required."
-        })
-    # Load the sheet data
+async def load_sheet_post(request: Request, sheet_id: str = Form(...), client_name: str = Form("")):
+    client_name = client_name.strip() or DEFAULT_CLIENT
+    debug = f"Loading Sheet. Sheet ID: {sheet_id}, client: {client_name}\n"
     try:
         if not sheet_id.strip():
             debug += "Sheet Id cannot be empty"
             raise ValueError("Sheet ID cannot be empty.")
-        
-        result = get_urls(sheet_id)
-
-        urls_to_analyze = result.get('urls', [])
-        debug += result.get('debug', '')
-
-        if not urls_to_analyze:
-            raise ValueError("No URLs found to analyze.")
+        if client_name not in PROMPT_CLIENTS:
+            # Only clients with preloaded prompts can be audited
+            raise ValueError(f"Unknown client '{client_name}'.")
 
-        load_return = load_sheet(sheet_id, urls_to_analyze, client_name)
+        # The run happens on a job worker; a sheet already being processed reuses its job.
+        # Workers pick jobs by client priority, quota and fair share (see tenants.py).
+        job, created = await run_in_threadpool(get_job_queue().submit, sheet_id.strip(), client_name)
+        debug += "Job queued.\n" if created else "Sheet is already being processed; showing the running job.\n"
 
-        if "error" in load_return:
-            raise ValueError(f"{load_return['debug']}\n")
-       
-        
-        if not load_return['data_rows']:
-            raise ValueError("No data found in the sheet. Please check the sheet ID and try again.\n")
-
-        print("Sheet data loaded successfully.\n")
-            
-        return templates.TemplateResponse("sheet_result.html", {
+        return templates.TemplateResponse("job_status.html", {
             "request": request,
-            "sheet_id": sheet_id,
-       #     "result": process_result,
+            "job": job,
             "debug": f"Debug info: {debug}"
         })
     except Exception as e:
@@ -87,3 +109,207 @@ async def load_sheet_post(request: Request, sheet_id: str = Form(...)):
         })
 # End load_sheet_post_before
 
+@app.get("/jobs")
+async def jobs_list():
+    return [public_job(job) for job in await run_in_threadpool(get_job_queue().list_jobs)]
+# End jobs_list
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await run_in_threadpool(get_job_queue().get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_job(job)
+# End job_status
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    # Server-Sent Events: per-URL stage transitions, counts, ETA and errors for one job.
+    # Subscribe before reading the job, so a "done" published in between is queued.
+    channel = job_channel(job_id)
+    subscriber = hub.subscribe(channel)
+    try:
+        job = await run_in_threadpool(get_job_queue().get, job_id)
+        runs_here = job is not None and get_job_queue().runs_here(job_id)
+    except Exception:
+        hub.unsubscribe(channel, subscriber)
+        raise
+    if not runs_here:
+        hub.unsubscribe(channel, subscriber)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if runs_here:
+        initial = [("snapshot", public_job(job))]
+        events = sse_events(channel, request, initial, subscriber)
+    else:
+        # Queued, finished or running in another worker process: follow the shared job state
+        events = job_snapshot_events(job_id, request)
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+# End job_events
+
+@app.get("/jobs/{job_id}/result", response_class=HTMLResponse)
+async def job_result(request: Request, job_id: str):
+    job = await run_in_threadpool(get_job_queue().get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job["status"] in ("queued", "running"):
+        return templates.TemplateResponse("job_status.html", {"request": request, "job": job, "debug": ""})
+
+    if job["status"] == "error":
+        return templates.TemplateResponse("error_sheet.html", {
+            "request": request,
+            "stage": "before",
+            "sheet_id": job["sheet_id"],
+            "error": job["error"],
+            "debug": f"Debug info: {job['debug']}"
+        })
+
+    return templates.TemplateResponse("sheet_result.html", {
+        "request": request,
+        "sheet_id": job["sheet_id"],
+        "result": tabs_summary(job["result"].get("tabs", [])),
+        "debug": f"Debug info: {job['debug']}"
+    })
+# End job_result
+
+def public_job(job: dict) -> dict:
+    # Status payload without the (large) debug log and raw result
+    fields = ("id", "sheet_id", "client_name", "status", "progress", "created", "started", "finished", "error")
+    payload = {key: job[key] for key in fields}
+    if job["result"]:
+        payload["tabs"] = [
+            {key: tab.get(key) for key in ("title", "status", "seconds", "error")}
+            for tab in job["result"].get("tabs", [])
+        ]
+    return payload
+# End public_job
+
+def tabs_summary(tabs: list) -> str:
+    rows = "".join(
+        f"<li>{escape(tab['title'])}: {escape(tab['status'])} ({tab['seconds']}s)"
+        + (f" - {escape(tab['error'])}" if tab.get("error") else "")
+        + "</li>"
+        for tab in tabs
+    )
+    return f"<ul>{rows}</ul>"
+# End tabs_summary
+
+@app.get("/reports/live", response_class=HTMLResponse)
+async def reports_live(request: Request):
+    return templates.TemplateResponse("report_stream.html", {"request": request})
+# End reports_live
+
+@app.get("/reports/stream")
+async def reports_stream(request: Request):
+    # Server-Sent Events: report text as the LLM produces it
+    return StreamingResponse(
+        sse_events(REPORTS_CHANNEL, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+# End reports_stream
+
+@app.get("/results", response_class=HTMLResponse)
+async def results_index(request: Request):
+    store = await run_in_threadpool(get_store)
+    etag = make_etag("results", await run_in_threadpool(store.versions_fingerprint))
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    sources = await run_in_threadpool(store.list_sources)
+    response = templates.TemplateResponse("results_index.html", {
+        "request": request,
+        "sources": sources,
+        "views": RESULT_VIEWS,
+    })
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+# End results_index
+
+@app.get("/results/{source_id}/{kind}", response_class=HTMLResponse)
+async def results_table(request: Request, source_id: str, kind: str):
+    etag, page = await results_page(request, source_id, kind)
+    if page is None:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    store = await run_in_threadpool(get_store)
+    response = templates.TemplateResponse("results_table.html", {
+        "request": request,
+        "source_id": source_id,
+        "kind": kind,
+        "view": RESULT_VIEWS[kind],
+        "page": page,
+        "filter_values": await run_in_threadpool(store.filter_values, kind, source_id),
+        "params": dict(request.query_params),
+    })
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+# End results_table
+
+@app.get("/api/results/{source_id}/{kind}")
+async def results_json(request: Request, source_id: str, kind: str):
+    etag, page = await results_page(request, source_id, kind)
+    if page is None:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        content=json.dumps(page, default=str),
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "no-cache"},
+    )
+# End results_json
+
+async def results_page(request: Request, source_id: str, kind: str):
+    """
+    One page of stored results, driven by the query string:
+    page, page_size, sort, desc=1, q (search) and one parameter per filter column.
+
+    Returns (etag, page); page is None when the client's copy is still current.
+    The ETag covers the table's write version and the query, so revalidating
+    an unchanged page costs one indexed lookup and no result query.
+    """
+    if kind not in RESULT_VIEWS:
+        raise HTTPException(status_code=404, detail="Unknown result view")
+
+    store = await run_in_threadpool(get_store)
+    version = await run_in_threadpool(store.result_version, source_id, RESULT_VIEWS[kind]["table"])
+    etag = make_etag(request.url.path, version, str(request.query_params))
+    if not_modified(request, etag):
+        return etag, None
+
+    params = request.query_params
+    try:
+        page_no = int(params.get("page", 1))
+        page_size = int(params.get("page_size", RESULTS_PAGE_SIZE))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="page and page_size must be integers")
+
+    page = await run_in_threadpool(
+        store.query_results,
+        kind,
+        source_id,
+        filters={column: params.get(column) for column in RESULT_VIEWS[kind]["filters"]},
+        search=params.get("q", ""),
+        sort=params.get("sort", ""),
+        descending=params.get("desc") == "1",
+        page=page_no,
+        page_size=page_size,
+    )
+    return etag, page
+# End results_page
+
+def make_etag(*parts) -> str:
+    return 'W/"' + hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:20] + '"'
+# End make_etag
+
+def not_modified(request: Request, etag: str) -> bool:
+    return etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+# End not_modified
@@ -4,13 +4,12 @@ import os
 import sys
 import re
 
-PAGE_SPEED_API_KEY = os.getenv("PAGE_SPEED_API_KEY")
-if not PAGE_SPEED_API_KEY:
-    raise ValueError("PAGE_SPEED_API_KEY environment variable is not set. Please set it in your .env file.")
+from concurrency_governor import governed_request
+from config import require_env
 
+# Checked when a URL is analyzed
+PAGE_SPEED_API_KEY = os.getenv("PAGE_SPEED_API_KEY")
 PAGE_SPEED_API_ENDPOINT = os.getenv("PAGE_SPEED_API_ENDPOINT")
-if not PAGE_SPEED_API_ENDPOINT:
-    raise ValueError("PAGE_SPEED_API_ENDPOINT environment variable is not set. Please set it in your .env file.")
 
 
 def analyze_both(url: str, completed: bool, row_no: int) -> dict:
@@ -60,11 +59,10 @@ def analyze_url(url: str, strategy: str, row_no: int) -> dict:
 
     print(f"PageSpeed analyzing: {strategy}")
 
-    if PAGE_SPEED_API_KEY:
-        params["key"] = PAGE_SPEED_API_KEY
+    params["key"] = require_env("PAGE_SPEED_API_KEY")
 
     try:
-        response = requests.get(PAGE_SPEED_API_ENDPOINT, params=params, timeout=60)
+        response = governed_request("pagespeed", "GET", require_env("PAGE_SPEED_API_ENDPOINT"), params=params, timeout=60)
         response.raise_for_status()
         data = response.json()
 
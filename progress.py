@@ -0,0 +1,99 @@
+import time
+import threading
+
+from event_stream import hub
+
+
+def job_channel(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+class ProgressTracker:
+    """
+    Progress of one audit run, published on its event channel.
+
+    Handlers add the number of items (URLs) they will process, then report
+    stage transitions per item. Every event carries the running counts and
+    an ETA extrapolated from the items finished so far.
+
+    Events: "progress" {item, tab, stage, done, total, errors, elapsed, eta},
+    "item_error" (same fields plus "error") and a final "done" {status, ...}.
+    """
+
+    def __init__(self, channel: str, on_change=None):
+        self.channel = channel
+        self.on_change = on_change
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.total = 0
+        self.done = 0
+        self.errors = 0
+        self.last_error = None
+
+    def add_total(self, count: int, tab: str = ""):
+        with self._lock:
+            self.total += count
+        self._publish("progress", {"item": None, "tab": tab, "stage": "queued", "added": count})
+
+    def stage(self, item: str, stage: str, tab: str = ""):
+        """`item` entered `stage` (e.g. "psi", "report", "links")."""
+        self._publish("progress", {"item": item, "tab": tab, "stage": stage})
+
+    def item_done(self, item: str, tab: str = "", error=None):
+        with self._lock:
+            self.done += 1
+            if error:
+                self.errors += 1
+                self.last_error = f"{item}: {error}"
+        if error:
+            self._publish("item_error", {"item": item, "tab": tab, "stage": "error", "error": str(error)})
+        else:
+            self._publish("progress", {"item": item, "tab": tab, "stage": "done"})
+
+    def tab_done(self, status: dict):
+        """A whole tab handler finished; `status` comes from sheet_loader.run_tab."""
+        self._publish("tab_done", {key: status.get(key) for key in ("title", "status", "seconds", "error")})
+
+    def finish(self, status: str, error: str = None):
+        self._publish("done", {"status": status, "error": error})
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            remaining = max(0, self.total - self.done)
+            # Unknown until the first item finishes
+            eta = round(elapsed / self.done * remaining, 1) if self.done else None
+            return {
+                "done": self.done,
+                "total": self.total,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "elapsed": round(elapsed, 1),
+                "eta": eta,
+            }
+
+    def _publish(self, event: str, data: dict):
+        counts = self.snapshot()
+        if self.on_change:
+            self.on_change(counts)
+        hub.publish(self.channel, event, dict(data, **counts))
+# End ProgressTracker
+
+
+class _NoProgress:
+    """Stand-in used when a handler runs without a tracker."""
+
+    def add_total(self, count, tab=""):
+        pass
+
+    def stage(self, item, stage, tab=""):
+        pass
+
+    def item_done(self, item, tab="", error=None):
+        pass
+
+    def tab_done(self, status):
+        pass
+
+
+NO_PROGRESS = _NoProgress()
@@ -0,0 +1,174 @@
+import os
+import re
+import json
+from dotenv import load_dotenv
+
+load_dotenv()  # Load variables from .env
+
+# Token budget for the PSI payload pasted into the SEO report prompt.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+# Rough chars-per-token ratio for English/JSON text; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+# Fields of a PSI strategy result that never help the report.
+REDUNDANT_FIELDS = {"row_no", "strategy"}
+
+# Diagnostics at or above this score are passing and left out.
+DIAGNOSTIC_PASS_SCORE = 0.9
+
+# Progressively smaller shapes tried until the payload fits the budget:
+# (opportunities kept, detail items per opportunity, diagnostics kept, include descriptions)
+DEGRADATION_STEPS = [
+    (10, 3, 10, True),
+    (8, 2, 6, True),
+    (6, 1, 4, False),
+    (5, 0, 2, False),
+    (3, 0, 0, False),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _strip_markdown_links(text):
+    # "[Learn more](https://...)" -> "" ; "[text](url)" -> "text"
+    if not text:
+        return text
+    text = re.sub(r"\[Learn[^\]]*\]\([^)]*\)\.?", "", text)
+    text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)
+    return text.strip()
+
+
+def _savings(opportunity: dict) -> tuple:
+    details = opportunity.get("details") or {}
+    return (details.get("overallSavingsMs") or 0, details.get("overallSavingsBytes") or 0)
+
+
+def _top_items(opportunity: dict, limit: int) -> list:
+    """Heaviest offending resources of an opportunity, reduced to url + savings."""
+    items = (opportunity.get("details") or {}).get("items") or []
+    items = sorted(
+        items,
+        key=lambda item: (item.get("wastedMs") or 0, item.get("wastedBytes") or 0),
+        reverse=True,
+    )
+    compact = []
+    for item in items[:limit]:
+        entry = {"url": item.get("url")}
+        if item.get("wastedMs"):
+            entry["ms"] = round(item["wastedMs"])
+        if item.get("wastedBytes"):
+            entry["kb"] = round(item["wastedBytes"] / 1024)
+        compact.append(entry)
+    return compact
+
+
+def _compact_strategy(result: dict, notes: dict, shape: tuple) -> dict:
+    max_opps, max_items, max_diags, _ = shape
+
+    if "error" in result:
+        return {"error": result["error"]}
+
+    compact = {
+        key: value for key, value in result.items()
+        if key not in REDUNDANT_FIELDS and key not in ("opportunities", "diagnostics")
+        and value is not None
+    }
+
+    # Dedupe by audit id, then rank by estimated savings (time first, then bytes)
+    unique = {}
+    for opportunity in result.get("opportunities") or []:
+        unique.setdefault(opportunity.get("id"), opportunity)
+    ranked = sorted(unique.values(), key=_savings, reverse=True)
+
+    opportunities = []
+    for opportunity in ranked:
+        savings_ms, savings_bytes = _savings(opportunity)
+        if not savings_ms and not savings_bytes and opportunity.get("score") == 1:
+            continue
+        notes.setdefault(opportunity.get("id"), opportunity.get("description"))
+        entry = {"id": opportunity.get("id"), "title": opportunity.get("title")}
+        if opportunity.get("displayValue"):
+            entry["value"] = opportunity["displayValue"]
+        if savings_ms:
+            entry["save_ms"] = round(savings_ms)
+        if savings_bytes:
+            entry["save_kb"] = round(savings_bytes / 1024)
+        items = _top_items(opportunity, max_items)
+        if items:
+            entry["top"] = items
+        opportunities.append(entry)
+    compact["opportunities"] = opportunities[:max_opps]
+
+    diagnostics = []
+    for diagnostic in result.get("diagnostics") or []:
+        score = diagnostic.get("score")
+        if score is None or score >= DIAGNOSTIC_PASS_SCORE:
+            continue
+        notes.setdefault(diagnostic.get("id"), diagnostic.get("description"))
+        entry = {"id": diagnostic.get("id"), "title": diagnostic.get("title")}
+        if diagnostic.get("displayValue"):
+            entry["value"] = diagnostic["displayValue"]
+        diagnostics.append(entry)
+    compact["diagnostics"] = diagnostics[:max_diags]
+
+    return compact
+
+
+def _build(data: dict, shape: tuple) -> dict:
+    notes = {}
+    payload = {}
+    for key, value in data.items():
+        if isinstance(value, dict) and ("strategy" in value or "error" in value):
+            payload[key] = _compact_strategy(value, notes, shape)
+        elif key not in REDUNDANT_FIELDS:
+            payload[key] = value
+
+    if shape[3]:
+        # Audit descriptions are shared between mobile and desktop; emit each once
+        # and only for audits that are still in the payload.
+        kept = {
+            entry["id"]
+            for block in payload.values() if isinstance(block, dict)
+            for entry in block.get("opportunities", []) + block.get("diagnostics", [])
+        }
+        payload["audit_notes"] = {
+            audit_id: _strip_markdown_links(text)
+            for audit_id, text in notes.items() if audit_id in kept and text
+        }
+    return payload
+
+
+def compact_psi_payload(data: dict, token_budget: int = None) -> tuple:
+    """
+    Shrink an analyze_both() result into a compact JSON string for the LLM prompt.
+
+    Opportunities are deduped and ranked by estimated savings, passing
+    diagnostics and redundant fields are dropped, and the payload is degraded
+    step by step until it fits the token budget.
+
+    Returns:
+        tuple: (payload_json, stats) where stats holds original, compact and saved token counts.
+    """
+    token_budget = token_budget or PROMPT_TOKEN_BUDGET
+    original_tokens = estimate_tokens(json.dumps(data, indent=2, default=str))
+
+    payload_json = ""
+    for shape in DEGRADATION_STEPS:
+        payload_json = json.dumps(_build(data, shape), separators=(",", ":"), ensure_ascii=False, default=str)
+        if estimate_tokens(payload_json) <= token_budget:
+            break
+    else:
+        # Still too large (e.g. an enormous error string): hard truncate.
+        payload_json = payload_json[:token_budget * CHARS_PER_TOKEN]
+
+    compact_tokens = estimate_tokens(payload_json)
+    stats = {
+        "original_tokens": original_tokens,
+        "compact_tokens": compact_tokens,
+        "saved_tokens": max(0, original_tokens - compact_tokens),
+        "token_budget": token_budget,
+    }
+    return payload_json, stats
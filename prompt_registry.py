@@ -0,0 +1,158 @@
+import os
+import re
+import importlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()  # Load variables from .env
+
+# Clients whose prompts are loaded (and validated) at startup, comma separated.
+PROMPT_CLIENTS = [c.strip() for c in os.getenv("PROMPT_CLIENTS", "webeyecare").split(",") if c.strip()]
+
+# Modules that register prompts when imported. preload() imports them itself,
+# so startup validation does not depend on who imported them first.
+PROMPT_MODULES = ["seo_report", "canonical_tag_report"]
+
+FIELD_PATTERN = re.compile(r"\{(\w+)\}")
+
+
+class CompiledPrompt:
+    """
+    A prompt template with its static fields (file contents, client name)
+    already substituted. Only the per-call fields are filled on render().
+    """
+
+    def __init__(self, template: str, static: dict):
+        self.segments = []   # literal strings and ("field",) markers
+        self.fields = set()
+        literal = []
+        position = 0
+        for match in FIELD_PATTERN.finditer(template):
+            literal.append(template[position:match.start()])
+            name = match.group(1)
+            if name in static:
+                literal.append(static[name])
+            else:
+                self.segments.append("".join(literal))
+                self.segments.append((name,))
+                self.fields.add(name)
+                literal = []
+            position = match.end()
+        literal.append(template[position:])
+        self.segments.append("".join(literal))
+
+    def render(self, **values) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise ValueError(f"Missing prompt fields: {', '.join(sorted(missing))}")
+        return "".join(
+            values[segment[0]] if isinstance(segment, tuple) else segment
+            for segment in self.segments
+        )
+# End CompiledPrompt
+
+
+class PromptRegistry:
+    """
+    Prompt templates compiled per client. Source files are read once and
+    re-read only when their mtime changes.
+    """
+
+    def __init__(self):
+        self._templates = {}   # name -> (template, sources)
+        self._compiled = {}    # (name, client) -> (CompiledPrompt, {path: mtime})
+        self._lock = threading.Lock()
+
+    def register(self, name: str, template: str, sources: dict):
+        """
+        Args:
+            name (str): Prompt name, e.g. "seo_report".
+            template (str): Text with {field} placeholders.
+            sources (dict): field -> (path, required). "{client}" in the path is
+                replaced with the client name. Optional files that are missing
+                render as an empty string.
+        """
+        with self._lock:
+            self._templates[name] = (template, sources)
+            for key in [key for key in self._compiled if key[0] == name]:
+                del self._compiled[key]
+
+    def _resolve(self, name: str, client: str) -> dict:
+        _, sources = self._templates[name]
+        return {
+            field: (path.format(client=client), required)
+            for field, (path, required) in sources.items()
+        }
+
+    @staticmethod
+    def _mtime(path: str):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _compile(self, name: str, client: str):
+        template, _ = self._templates[name]
+        static = {"client_name": client}
+        mtimes = {}
+        for field, (path, required) in self._resolve(name, client).items():
+            mtimes[path] = self._mtime(path)
+            try:
+                with open(path, "r") as f:
+                    content = f.read()
+            except OSError:
+                content = ""
+            if required and not content:
+                raise ValueError(f"Prompt file for client '{client}' is empty or missing: {path}")
+            static[field] = content
+        print(f"Compiled prompt '{name}' for client '{client}'")
+        return CompiledPrompt(template, static), mtimes
+
+    def get(self, name: str, client: str) -> CompiledPrompt:
+        with self._lock:
+            if name not in self._templates:
+                raise KeyError(f"Unknown prompt '{name}'")
+            cached = self._compiled.get((name, client))
+            if cached:
+                compiled, mtimes = cached
+                if all(self._mtime(path) == mtime for path, mtime in mtimes.items()):
+                    return compiled
+            compiled, mtimes = self._compile(name, client)
+            self._compiled[(name, client)] = (compiled, mtimes)
+            return compiled
+
+    def preload(self, clients: list = None):
+        """
+        Compile every registered prompt for every client. Raises ValueError
+        listing all missing prompt files, so a bad setup fails at startup.
+        """
+        for module in PROMPT_MODULES:
+            importlib.import_module(module)
+        if not self._templates:
+            raise ValueError("No prompts registered.")
+
+        errors = []
+        for client in clients or PROMPT_CLIENTS:
+            for name in list(self._templates):
+                try:
+                    self.get(name, client)
+                except ValueError as e:
+                    errors.append(str(e))
+        if errors:
+            raise ValueError("\n".join(errors))
+# End PromptRegistry
+
+
+registry = PromptRegistry()
+
+
+def register_prompt(name: str, template: str, sources: dict):
+    registry.register(name, template, sources)
+
+
+def get_prompt(name: str, client: str) -> CompiledPrompt:
+    return registry.get(name, client)
+
+
+def preload_prompts(clients: list = None):
+    registry.preload(clients)
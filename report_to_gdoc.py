@@ -1,145 +1,322 @@
 import os
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+import re
+import sys
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from concurrency_governor import governed, status_from_exception
+from config import require_env
+from sheets_client import get_credentials, DRIVE_SCOPES
+from tenants import bind_tenant
+from write_queue import write_queue, DOCS_WRITES_PER_MINUTE
 
 # === CONFIGURATION ===
 
+# Checked when a report is published
 GOOGLE_DRIVE_REPORT_FOLDER = os.getenv("GOOGLE_DRIVE_REPORT_FOLDER")
-if not GOOGLE_DRIVE_REPORT_FOLDER:
-    raise ValueError("GOOGLE_DRIVE_REPORT_FOLDER environment variable is not set. Please set it in your .env file.")
+# Optional address given writer access to every published report
+GOOGLE_DRIVE_SHARE_WITH = os.getenv("GOOGLE_DRIVE_SHARE_WITH")
+# Folder path -> Drive folder ID, kept across runs so folders are looked up once
+DRIVE_FOLDER_CACHE = os.getenv("DRIVE_FOLDER_CACHE", os.path.join("cache", "drive_folders.json"))
+# Reports created at the same time by publish_reports; the governor still caps Drive calls
+DOCS_PUBLISH_WORKERS = int(os.getenv("DOCS_PUBLISH_WORKERS", "4"))
 
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+# Docs allows 60 writes per minute per user, across documents, so every
+# document's batchUpdate goes through one write queue target
+DOCS_QUEUE_KEY = "docs"
 
-SERVICE_ACCOUNT_FILE = "credentials/google_service_account.json"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+DOC_MIME_TYPE = "application/vnd.google-apps.document"
 
 # === SETUP GOOGLE API AUTH ===
-creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-gc = gspread.authorize(creds)
-drive_service = build('drive', 'v3', credentials=creds)
-docs_service = build("docs", "v1", credentials=creds)
+# Drive and Docs clients are built on first use and then reused. Credentials
+# are shared with sheets_client so the service-account file is read once.
+_services = {}
+_services_lock = threading.Lock()
 
-def txt_to_doc(filepath: str, client_name):
+def get_service(name: str, version: str):
+    with _services_lock:
+        if (name, version) not in _services:
+            from googleapiclient.discovery import build
+            _services[(name, version)] = build(name, version, credentials=get_credentials(DRIVE_SCOPES))
+        return _services[(name, version)]
 
-    # === DERIVE SHEET NAME FROM FILE PATH ===
-    # Target Google Drive path
-    folder_path_parts = [GOOGLE_DRIVE_REPORT_FOLDER, client_name]
-    parent_id = "root"
-    doc_title = os.path.splitext(os.path.basename(filepath))[0]
+# === MARKDOWN TO DOCS REQUESTS ===
 
-    try:
-        # Step 1: Find or create each folder level
-        for folder_name in folder_path_parts:
-            query = f"'{parent_id}' in parents and name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder'"
-            response = drive_service.files().list(q=query, fields="files(id)").execute()
+HEADING = re.compile(r"^\s*(#{1,6})\s+(.*?)\s*#*\s*$")
+LIST_ITEM = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+(.*)$")
+RULE = re.compile(r"^\s*([-*_=])(\s*\1){2,}\s*$")
+BOLD = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+
+BULLET_PRESETS = {
+    "bullet": "BULLET_DISC_CIRCLE_SQUARE",
+    "numbered": "NUMBERED_DECIMAL_ALPHA_ROMAN",
+}
+
+def utf16_len(text: str) -> int:
+    """Docs indexes count UTF-16 code units, so emoji take two."""
+    return len(text.encode("utf-16-le")) // 2
+
+def parse_markdown(markdown: str) -> list:
+    """
+    Split a report into paragraphs: dicts with "text" (markers removed),
+    "heading" (1-6 or None), "list" ("bullet", "numbered" or None), "level"
+    (list nesting, two spaces per level) and "bold" ([(start, end)] offsets
+    into text). Blank lines and horizontal rules are dropped.
+    """
+    paragraphs = []
+    for line in markdown.splitlines():
+        if not line.strip() or RULE.match(line):
+            continue
+
+        heading, kind, level = None, None, 0
+        match = HEADING.match(line)
+        item = LIST_ITEM.match(line)
+        if match:
+            heading, text = len(match.group(1)), match.group(2)
+        elif item:
+            kind = "numbered" if item.group(2)[0].isdigit() else "bullet"
+            level = min(len(item.group(1).expandtabs(4)) // 2, 8)
+            text = item.group(3)
+        else:
+            text = line.strip()
+
+        plain, bold, position = "", [], 0
+        for bold_match in BOLD.finditer(text):
+            plain += text[position:bold_match.start()]
+            inner = bold_match.group(1) or bold_match.group(2)
+            bold.append((len(plain), len(plain) + len(inner)))
+            plain += inner
+            position = bold_match.end()
+        plain += text[position:]
+
+        if plain.strip():
+            paragraphs.append({"text": plain, "heading": heading, "list": kind, "level": level, "bold": bold})
+    return paragraphs
+
+def markdown_to_doc_requests(markdown: str, index: int = 1) -> list:
+    """
+    Docs batchUpdate requests that insert a markdown report at `index` (1 is
+    the start of an empty document) with heading, list and bold styles.
+
+    The whole text goes in with one insertText; styles follow as range
+    updates. Nested list items carry leading tabs, which createParagraphBullets
+    turns into nesting and removes, so the bullet requests come last and in
+    reverse document order: each removal only shifts text after it.
+    """
+    text = ""
+    styles = []
+    lists = []   # [kind, start, end] of consecutive list items
+    position = index
+    for paragraph in parse_markdown(markdown):
+        prefix = "\t" * paragraph["level"] if paragraph["list"] else ""
+        start = position
+        content_start = start + utf16_len(prefix)
+        end = content_start + utf16_len(paragraph["text"])
+
+        if paragraph["heading"]:
+            styles.append({"updateParagraphStyle": {
+                "range": {"startIndex": start, "endIndex": end},
+                "paragraphStyle": {"namedStyleType": f"HEADING_{paragraph['heading']}"},
+                "fields": "namedStyleType",
+            }})
+        for bold_start, bold_end in paragraph["bold"]:
+            styles.append({"updateTextStyle": {
+                "range": {
+                    "startIndex": content_start + utf16_len(paragraph["text"][:bold_start]),
+                    "endIndex": content_start + utf16_len(paragraph["text"][:bold_end]),
+                },
+                "textStyle": {"bold": True},
+                "fields": "bold",
+            }})
+        if paragraph["list"]:
+            if lists and lists[-1][0] == paragraph["list"] and lists[-1][2] == start:
+                lists[-1][2] = end + 1
+            else:
+                lists.append([paragraph["list"], start, end + 1])
+
+        text += prefix + paragraph["text"] + "\n"
+        position = end + 1
+
+    if not text:
+        return []
+
+    bullets = [
+        {"createParagraphBullets": {
+            "range": {"startIndex": start, "endIndex": end},
+            "bulletPreset": BULLET_PRESETS[kind],
+        }}
+        for kind, start, end in reversed(lists)
+    ]
+    return [{"insertText": {"location": {"index": index}, "text": text}}] + styles + bullets
+
+# === DRIVE FOLDERS ===
+
+_folder_cache = None
+_folder_lock = threading.Lock()
+
+def _load_folder_cache() -> dict:
+    global _folder_cache
+    if _folder_cache is None:
+        try:
+            with open(DRIVE_FOLDER_CACHE, "r", encoding="utf-8") as f:
+                _folder_cache = json.load(f)
+        except (OSError, ValueError):
+            _folder_cache = {}
+    return _folder_cache
+
+def _save_folder_cache():
+    os.makedirs(os.path.dirname(DRIVE_FOLDER_CACHE) or ".", exist_ok=True)
+    temp_path = f"{DRIVE_FOLDER_CACHE}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(_folder_cache, f, indent=2)
+    os.replace(temp_path, DRIVE_FOLDER_CACHE)
+
+def resolve_folder(folder_path_parts: list) -> str:
+    """
+    ID of the Drive folder at root/<part>/<part>..., created where missing.
+    IDs come from the persistent folder cache when known; Drive is only
+    queried for levels seen for the first time. Serialized, so parallel
+    publishing never creates the same folder twice.
+    """
+    drive_service = get_service("drive", "v3")
+    with _folder_lock:
+        cache = _load_folder_cache()
+        parent_id = "root"
+        changed = False
+        for depth, folder_name in enumerate(folder_path_parts, start=1):
+            path = "/".join(folder_path_parts[:depth])
+            if path in cache:
+                parent_id = cache[path]
+                continue
+
+            name = folder_name.replace("\\", "\\\\").replace("'", "\\'")
+            query = f"'{parent_id}' in parents and name = '{name}' and mimeType = '{FOLDER_MIME_TYPE}' and trashed = false"
+            with governed("drive"):
+                response = drive_service.files().list(q=query, fields="files(id)").execute()
             files = response.get("files", [])
 
             if files:
                 parent_id = files[0]["id"]
             else:
-                new_folder = drive_service.files().create(
-                    body={
-                        "name": folder_name,
-                        "mimeType": "application/vnd.google-apps.folder",
-                        "parents": [parent_id]
-                    },
-                    fields="id"
-                ).execute()
+                with governed("drive"):
+                    new_folder = drive_service.files().create(
+                        body={"name": folder_name, "mimeType": FOLDER_MIME_TYPE, "parents": [parent_id]},
+                        fields="id"
+                    ).execute()
                 parent_id = new_folder["id"]
+            cache[path] = parent_id
+            changed = True
 
-    except Exception as e:
-        print(f"Error Find or create each folder level: {e}")
-        return False
+        if changed:
+            _save_folder_cache()
+        return parent_id
 
-    try:
-        # === STEP 2: READ TXT FILE CONTENT ===
-        with open(filepath, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        # Format: one row per line, one column (A) per row
-        data_rows = [[line.strip()] for line in lines if line.strip()]
+def forget_folders(folder_path_parts: list):
+    """Drop cached IDs under a path, e.g. after the folder was deleted in Drive."""
+    with _folder_lock:
+        cache = _load_folder_cache()
+        prefix = "/".join(folder_path_parts[:1])
+        for path in [path for path in cache if path == prefix or path.startswith(prefix + "/")]:
+            del cache[path]
+        _save_folder_cache()
 
-    except Exception as e:
-        print(f"Error Reading the text file: {e}")
-        return False
+# === PUBLISHING ===
 
-    try:
-        # === STEP 3: CREATE GOOGLE DOC ===
-        doc_metadata = {
-            "title": doc_title,
-            "parents": [parent_id]  # Put the doc in the correct folder
-        }
-        doc = drive_service.files().create(
-            body=doc_metadata,
-            fields="id"
-        ).execute()
-        doc_id = doc.get("id")
-    except Exception as e:
-        print(f"Error Creating Google Doc: {e}")
-        return False
-    
-    try:
-        drive_service.permissions().create(
-            fileId=doc_id,
-            body={
-                "type": "user",  # or 'domain', 'group', or 'anyone'
-                "role": "writer",  # 'reader', 'commenter', or 'writer'
-                "emailAddress": creds.service_account_email  # replace with real address
-            },
-            sendNotificationEmail=False,  # Don't send email notification
-            fields="id"
-        ).execute()
+def txt_to_doc(filepath: str, client_name):
+    """
+    Publish a markdown report as a Google Doc in <report folder>/<client>.
 
-    except Exception as e:
-        print(f"Error Granting Permission Google Doc: {e}")
-        return False
+    The document is created in the folder directly, then filled by a single
+    batchUpdate (text plus styles) sent behind by the write queue under the
+    Docs write quota; write_queue.flush(DOCS_QUEUE_KEY) waits for it.
 
-    
-    # === STEP 4: INSERT TEXT INTO DOC ===
+    Returns:
+        str: The document's URL, or False when it could not be created.
+    """
+    folder_path_parts = [require_env("GOOGLE_DRIVE_REPORT_FOLDER"), client_name]
+    drive_service = get_service("drive", "v3")
+    docs_service = get_service("docs", "v1")
+    doc_title = os.path.splitext(os.path.basename(filepath))[0]
 
     try:
-        doc = docs_service.documents().get(documentId=doc_id).execute()
-        content = doc.get("body", {}).get("content", [])
-        end_index = content[-1]["endIndex"] if content else 1
-    
+        with open(filepath, "r", encoding="utf-8") as f:
+            requests = markdown_to_doc_requests(f.read())
     except Exception as e:
-        print(f"Error Requesting Google Doc: {e}")
+        print(f"Error Reading the text file: {e}")
         return False
 
-    requests = []
-    for line in lines:
+    doc_id = None
+    for attempt in range(2):
         try:
-            text = str(line).strip()
-            if not text:
+            parent_id = resolve_folder(folder_path_parts)
+            with governed("drive"):
+                doc = drive_service.files().create(
+                    body={"name": doc_title, "mimeType": DOC_MIME_TYPE, "parents": [parent_id]},
+                    fields="id"
+                ).execute()
+            doc_id = doc.get("id")
+            break
+        except Exception as e:
+            if attempt == 0 and status_from_exception(e) == 404:
+                # A cached folder no longer exists; look the path up again
+                forget_folders(folder_path_parts)
                 continue
-            requests.append({
-                "insertText": {
-                    "location": {"index": end_index},
-                    "text": text + "\n"
-                }
-            })
-            end_index += len(text) + 1
-        except Exception as ex:
-            print(f"Skipped line due to error: {ex} — line: {line}")
-
-    print(requests)
-    print("-------")
+            print(f"Error Creating Google Doc: {e}")
+            return False
+
+    if GOOGLE_DRIVE_SHARE_WITH:
+        try:
+            with governed("drive"):
+                drive_service.permissions().create(
+                    fileId=doc_id,
+                    body={"type": "user", "role": "writer", "emailAddress": GOOGLE_DRIVE_SHARE_WITH},
+                    sendNotificationEmail=False,  # Don't send email notification
+                    fields="id"
+                ).execute()
+        except Exception as e:
+            print(f"Error Granting Permission Google Doc: {e}")
+            return False
+
     print(f"Doc Id: {doc_id}")
 
-    try:
-        if requests:
-            docs_service.documents().batchUpdate(documentId=doc_id, body={"requests": requests}).execute()
-            print(f"Successfully inserted {len(requests)} lines")
-        else:
-            print(" No valid lines to insert.")
+    if requests:
+        def insert_report():
+            with governed("docs"):
+                docs_service.documents().batchUpdate(documentId=doc_id, body={"requests": requests}).execute()
+            print(f"Successfully wrote {doc_title} ({len(requests)} requests)")
 
-    except Exception as e:
-        print(f"Error Inserting Text in Doc: {e}")
-        return False
+        write_queue.enqueue_call(DOCS_QUEUE_KEY, insert_report, f"Doc {doc_title}", per_minute=DOCS_WRITES_PER_MINUTE)
+    else:
+        print(" No valid lines to insert.")
 
-     # === STEP 5: Output the link
     print(f" View it here: https://docs.google.com/document/d/{doc_id}/edit")
 
     return f"https://docs.google.com/document/d/{doc_id}/edit"
-    
-   
+
+def publish_reports(filepaths: list, client_name, workers: int = DOCS_PUBLISH_WORKERS) -> dict:
+    """
+    Publish many reports: documents are created in parallel (Drive calls
+    under the governor), their content is written one batchUpdate per
+    document at the Docs write quota, and this waits until all are written.
+
+    Returns:
+        dict: {"docs": {filepath: url or False}, "errors": [write errors]}
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="gdoc") as pool:
+        urls = list(pool.map(bind_tenant(lambda filepath: txt_to_doc(filepath, client_name)), filepaths))
+    errors = write_queue.flush(DOCS_QUEUE_KEY)
+    return {"docs": dict(zip(filepaths, urls)), "errors": errors}
+
+
+if __name__ == "__main__":
+    # python report_to_gdoc.py <client_name> <report.txt> [<report.txt> ...]
+    if len(sys.argv) < 3:
+        print("Usage: report_to_gdoc.py <client_name> <report.txt> [...]")
+        sys.exit(1)
+    result = publish_reports(sys.argv[2:], sys.argv[1])
+    for filepath, url in result["docs"].items():
+        print(f"{'✅' if url else '❌'} {filepath}: {url or 'not published'}")
+    for error in result["errors"]:
+        print(f"❌ {error}")
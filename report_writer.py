@@ -0,0 +1,42 @@
+import os
+
+from event_stream import hub
+
+# Channel on which report text is forwarded to SSE subscribers.
+REPORTS_CHANNEL = "reports"
+
+
+def stream_report_to_file(chunks, filepath: str, label: str) -> str:
+    """
+    Write LLM output to `filepath` chunk by chunk as it arrives, flushing each
+    chunk so the file can be tailed, and forward every chunk on the reports
+    channel. A partial file is removed if the stream fails.
+
+    Returns:
+        str: The path of the written report.
+    """
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    hub.publish(REPORTS_CHANNEL, "report_start", {"report": label, "file": filepath})
+
+    size = 0
+    try:
+        with open(filepath, "w") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                f.flush()
+                size += len(chunk)
+                hub.publish(REPORTS_CHANNEL, "report_chunk", {"report": label, "text": chunk})
+    except Exception as e:
+        hub.publish(REPORTS_CHANNEL, "report_error", {"report": label, "error": str(e)})
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+        raise
+
+    if not size:
+        os.remove(filepath)
+        raise ValueError(f"Empty report for {label}")
+
+    hub.publish(REPORTS_CHANNEL, "report_done", {"report": label, "file": filepath, "chars": size})
+    return filepath
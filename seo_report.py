@@ -1,45 +1,15 @@
-from google_studio_ai import generate_report
+from llm_backends import generate_report_stream
 import json
 import os
 import datetime
 import re
 from report_to_gdoc import txt_to_doc
+from prompt_compactor import compact_psi_payload
+from prompt_registry import register_prompt, get_prompt
+from report_writer import stream_report_to_file
+from fast_report import FAST_PATH_ENABLED, is_healthy, render_fast_report
 
-def generate_txt_file_report(report, client_name, url):
-    try:
-        print("generating Text File with SEO Report")
-        report_dir = "report"
-        os.makedirs(report_dir, exist_ok=True)
-        now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        # Sanitize client_name and url to be valid filenames
-        safe_client_name = re.sub(r'[^A-Za-z0-9_\-]', '_', client_name)
-        safe_url = re.sub(r'[^A-Za-z0-9_\-]', '_', url)
-        filename = f"{safe_client_name}_{safe_url}_{now}.txt"
-        filepath = os.path.join(report_dir, filename)
-        with open(filepath, "w") as f:
-            f.write(report)
-        return filepath
-    except Exception as e:
-        raise ValueError(f"Unable to generate {filepath}") from e
-
-def generate_seo_report(data, client_name, url):
-  
-    print("generating SEO Report")
-    debug = ""
-
-    with open(f"prompts/{client_name}__pagespeed-audit-prompt.md", "r") as f:
-        custom_prompt = f.read()
-
-    if not custom_prompt:
-        raise ValueError(f"Prompt file for client '{client_name}' is empty or missing.")
-
-    with open(f"report/example.txt", "r") as fi:
-        example_report = fi.read()
-    
-    if not example_report:
-        example_report = ''
-    
-    prompt = f"""
+SEO_PROMPT_TEMPLATE = """
     You are a technical SEO expert with experience in interpreting Google PageSpeed Insights data.
 
     Given an array of audit results from the PageSpeed API (mobile and desktop), analyze and summarize the key metrics as if it were a Lighthouse report. Provide a clear breakdown of:
@@ -68,21 +38,65 @@ def generate_seo_report(data, client_name, url):
     
     ## Input:
     --------
-    Below is the raw PageSpeed Insights API output, structured as JSON. Analyze and use it to populate the fields above.
+    Below is the PageSpeed Insights API output (mobile and desktop), structured as compact JSON.
+    Opportunities are ranked by estimated savings (save_ms / save_kb); "top" lists the heaviest offending resources
+    and "audit_notes" holds the description of each audit id. Analyze and use it to populate the fields above.
 
-    {json.dumps(data, indent=2)}
+    {payload}
     """
+
+register_prompt("seo_report", SEO_PROMPT_TEMPLATE, {
+    "custom_prompt": ("prompts/{client}__pagespeed-audit-prompt.md", True),
+    "example_report": ("report/example.txt", False),
+})
+
+def report_filepath(client_name, url):
+    report_dir = "report"
+    now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Sanitize client_name and url to be valid filenames
+    safe_client_name = re.sub(r'[^A-Za-z0-9_\-]', '_', client_name)
+    safe_url = re.sub(r'[^A-Za-z0-9_\-]', '_', url)
+    filename = f"{safe_client_name}_{safe_url}_{now}.txt"
+    return os.path.join(report_dir, filename)
+
+def generate_seo_report(data, client_name, url, use_cache=True):
+  
+    print("generating SEO Report")
+    debug = ""
+
+    # Healthy pages get a template report; only problem pages go to the LLM
+    if FAST_PATH_ENABLED and is_healthy(data):
+        print(f"Fast path: {url} passes every threshold, skipping the LLM")
+        try:
+            return stream_report_to_file(
+                iter([render_fast_report(data, url, client_name)]),
+                report_filepath(client_name, url),
+                url,
+            )
+        except Exception as e:
+            raise ValueError(f"Text - Unable to create Text file") from e
+
+    payload, payload_stats = compact_psi_payload(data)
+    print(
+        f"PSI payload: {payload_stats['compact_tokens']} tokens "
+        f"(was {payload_stats['original_tokens']}, saved {payload_stats['saved_tokens']})"
+    )
+
+    prompt = get_prompt("seo_report", client_name).render(payload=payload)
+
+    # Tokens are written to the report file (and forwarded to SSE listeners) as they arrive
     try:
-        report = generate_report(prompt)   
-    except Exception as e:
-        print(e)
-        raise ValueError(f"LightHouse - Unable to gather analitics")
-    
-    try:
-        file = generate_txt_file_report(report, client_name, url)
+        file = stream_report_to_file(
+            generate_report_stream(prompt, use_cache=use_cache),
+            report_filepath(client_name, url),
+            url,
+        )
+    except LLMBackendError as e:
+        raise ValueError(f"LightHouse - Unable to gather analitics") from e
+    except OSError as e:
+        raise ValueError(f"Text - Unable to create Text file") from e
     except Exception as e:
-        print(e)
-        raise ValueError(f"Text - Unable to create Text file")
+        raise ValueError(f"LightHouse - Unable to gather analitics") from e
 
    # try:
    #     gdoc = txt_to_doc(file, client_name)
@@ -0,0 +1,134 @@
+import re
+import json
+import hashlib
+
+from concurrency_governor import governed
+
+# Keys the Sheets API adds as mirrors of the ones we send (theme-aware styles).
+IGNORED_KEYS = {"backgroundColorStyle", "foregroundColorStyle", "colorStyle"}
+
+
+def column_index(letters: str) -> int:
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + (ord(letter) - ord("A") + 1)
+    return index - 1
+
+
+def grid_range(a1: str, sheet_id: int) -> dict:
+    """
+    A1 range (e.g. "D3:K", "D1:D", "C3:C100") to a Sheets API GridRange.
+    Open-ended rows or columns are left out, like the API does.
+    """
+    match = re.fullmatch(r"([A-Z]+)(\d*)(?::([A-Z]*)(\d*))?", a1.upper())
+    if not match:
+        raise ValueError(f"Unsupported A1 range: {a1}")
+    start_col, start_row, end_col, end_row = match.groups()
+    end_col = end_col or start_col
+    if ":" not in a1:
+        end_row = start_row
+
+    grid = {"sheetId": sheet_id, "startColumnIndex": column_index(start_col), "endColumnIndex": column_index(end_col) + 1}
+    if start_row:
+        grid["startRowIndex"] = int(start_row) - 1
+    if end_row:
+        grid["endRowIndex"] = int(end_row)
+    return grid
+
+
+def api_rule(spec: dict, sheet_id: int) -> dict:
+    """
+    Declarative rule spec to a Sheets API ConditionalFormatRule.
+
+    spec = {"ranges": ["D1:D"], "condition": ("NUMBER_EQ", ["200"]), "color": (0.8, 1, 0.8)}
+    """
+    condition_type, values = spec["condition"]
+    red, green, blue = spec["color"]
+    return {
+        "ranges": [grid_range(a1, sheet_id) for a1 in spec["ranges"]],
+        "booleanRule": {
+            "condition": {
+                "type": condition_type,
+                "values": [{"userEnteredValue": value} for value in values],
+            },
+            "format": {"backgroundColor": {"red": red, "green": green, "blue": blue}},
+        },
+    }
+
+
+def _normalize(value):
+    """Drop defaults the API omits (0, empty, None) and round floats, so live and desired rules compare equal."""
+    if isinstance(value, dict):
+        normalized = {}
+        for key, item in value.items():
+            if key in IGNORED_KEYS:
+                continue
+            item = _normalize(item)
+            if item in (None, 0, 0.0, "", [], {}):
+                continue
+            normalized[key] = item
+        return normalized
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, float):
+        return round(value, 3)
+    return value
+
+
+def fingerprint(rule: dict) -> str:
+    material = json.dumps(_normalize(rule), sort_keys=True)
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+
+def _ranges_key(rule: dict) -> str:
+    return json.dumps(sorted(json.dumps(_normalize(r), sort_keys=True) for r in rule.get("ranges", [])))
+
+
+def ensure_conditional_formats(worksheet, specs: list) -> dict:
+    """
+    Make the worksheet's conditional formats match `specs`, touching only the
+    rules on the ranges we manage. Live rules are fetched in one request and
+    compared by fingerprint; if anything differs, the stale managed rules are
+    deleted and the desired ones added in a single batchUpdate.
+
+    Returns:
+        dict: {"changed": bool, "debug": str}
+    """
+    spreadsheet = worksheet.spreadsheet
+    sheet_id = worksheet.id
+    desired = [api_rule(spec, sheet_id) for spec in specs]
+    desired_prints = [fingerprint(rule) for rule in desired]
+    managed_ranges = {_ranges_key(rule) for rule in desired}
+
+    with governed("sheets"):
+        metadata = spreadsheet.fetch_sheet_metadata(
+            params={"fields": "sheets(properties(sheetId),conditionalFormats)"}
+        )
+
+    live = []
+    for sheet in metadata.get("sheets", []):
+        if sheet.get("properties", {}).get("sheetId", 0) == sheet_id:
+            live = sheet.get("conditionalFormats", [])
+            break
+
+    managed = [(index, rule) for index, rule in enumerate(live) if _ranges_key(rule) in managed_ranges]
+    if [fingerprint(rule) for _, rule in managed] == desired_prints:
+        return {"changed": False, "debug": f"Conditional formats on '{worksheet.title}' already up to date.\n"}
+
+    # Delete from the highest index down so earlier indices stay valid
+    requests = [
+        {"deleteConditionalFormatRule": {"sheetId": sheet_id, "index": index}}
+        for index, _ in sorted(managed, reverse=True)
+    ]
+    requests += [
+        {"addConditionalFormatRule": {"rule": rule, "index": index}}
+        for index, rule in enumerate(desired)
+    ]
+
+    with governed("sheets"):
+        spreadsheet.batch_update({"requests": requests})
+
+    return {
+        "changed": True,
+        "debug": f"Conditional formats on '{worksheet.title}' updated ({len(managed)} removed, {len(desired)} added).\n",
+    }
@@ -1,42 +1,54 @@
-import pandas as pd
-import gspread
-from gspread_dataframe import set_with_dataframe
-from gspread_formatting import (
-    get_conditional_format_rules,
-    ConditionalFormatRule,
-    BooleanRule,
-    BooleanCondition,
-    CellFormat,
-    Color,
-    GridRange
-)
 import traceback
-from google.oauth2.service_account import Credentials
-from fastapi.templating import Jinja2Templates
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 from check_inpage_urls import check_inpage_urls
 from internal_linking_checking import analyze_page_internal_links
-from pagespeed import analyze_both
-from seo_report import generate_seo_report
+from site_speed_pipeline import run_site_speed_pipeline
 from check_canonical_tags import check_canonical_tags
+from concurrency_governor import governed, format_governor_report
+from sheet_formatting import ensure_conditional_formats
+from sheets_client import get_credentials, get_client, open_spreadsheet, get_worksheets, a1_range
+from llm_cache import cache_metrics
+from llm_backends import format_backend_stats
+from storage import get_store, is_local, SITE_SPEED_COLUMNS
+from write_queue import write_queue, format_queue_report
+from progress import NO_PROGRESS
+from tenants import bind_tenant
 
 from dotenv import load_dotenv
 import os
 
 load_dotenv()  # Load variables from .env
 
-# Templates
-templates = Jinja2Templates(directory="templates")
+SITE_SPEED_TAB = "Site Speed & Asset Optimization"
+BAD_LINKS_TAB = "Bad Links"
 
+# URL (A), before completed (M) and after completed (Y); data starts on row 3
+URL_COLUMNS = ["A3:A", "M3:M", "Y3:Y"]
+URL_START_ROW = 3
 
-global global_checked_url
-global_check_url = []
-# Define the scopes and credentials path
+# Tabs processed when running against the local store instead of a sheet
+LOCAL_TABS = [SITE_SPEED_TAB, BAD_LINKS_TAB, "Internal Linking Improvements", "Crawl & Indexing Optimization"]
 
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-
-SERVICE_ACCOUNT_FILE = "credentials/google_service_account.json"
+def iter_url_rows(url_column, before_column=(), after_column=(), start_row=URL_START_ROW):
+    """
+    Yield one dict per non-empty URL cell from column-major values.
+    Trailing empty cells are not returned by the API, hence the padding.
+    """
+    for i, url in enumerate(url_column):
+        url = url.strip()
+        if not url:
+            continue
+        before = before_column[i] if i < len(before_column) else ""
+        after = after_column[i] if i < len(after_column) else ""
+        yield {
+            "url": url,                         # Column A
+            "before_completed": before.strip(), # Column M
+            "after_completed": after.strip(),   # Column Y
+            "row_no": start_row + i             # Google Sheets row number
+        }
 
 def get_urls(sheet_id: str) -> dict:
 
@@ -47,23 +59,32 @@ def get_urls(sheet_id: str) -> dict:
     try:
 
         debug = f"Getting URL from load_sheet for sheet_id: {sheet_id}\n"        
-        # Authenticate and connect to Google Sheets
+
+        if is_local():
+            urls = get_store().get_urls(sheet_id)
+            if not urls:
+                raise ValueError(f"No URLs imported for '{sheet_id}' in the local store.")
+            debug += f"Loaded {len(urls)} URLs from the local store.\n"
+            return {"urls": urls, "debug": debug}
+
+        # Authenticate and connect to Google Sheets (credentials, client and
+        # spreadsheet metadata are cached across calls by sheets_client)
         try:
-            creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+            get_credentials()
             debug += "Credentials loaded successfully.\n"
         except Exception as cred_err:
             debug += f"Error loading credentials: {cred_err}\n"
             raise
 
         try:
-            client = gspread.authorize(creds)
+            get_client()
             debug += "Client authorized successfully.\n"
         except Exception as client_err:
             debug += f"Error authorizing Client: {client_err}\n"
             raise
 
         try:
-            spreadsheet = client.open_by_key(sheet_id)
+            spreadsheet = open_spreadsheet(sheet_id)
             debug += "Spreadsheet opened successfully.\n"
         except Exception as e:
             debug += f"Error opening spreadsheet: {traceback.format_exc()}\n"
@@ -71,37 +92,26 @@ def get_urls(sheet_id: str) -> dict:
             
         print(f"Spreadsheet '{spreadsheet.title}' loaded successfully.\n")
 
-        # Loop through all tabs/worksheets
-        for worksheet in spreadsheet.worksheets():
-            title = worksheet.title
-            if title != "Site Speed & Asset Optimization":
-                continue
-            # End if
-
-            debug += f"📄 Loading tab: {title}"
-
-            # Get all values from the worksheet as raw rows (lists of lists)
-            all_rows = worksheet.get_all_values()
+        title = SITE_SPEED_TAB
+        debug += f"📄 Loading tab: {title}"
 
-            # Skip the first two rows if they are headers
-            data_rows = all_rows[2:]  # Row indices start at 0
-            #debug += f"\n📄 Data Rows: {data_rows[:5]}..."
+        # Read only columns A, M and Y of the tab, by title, in one request
+        try:
+            with governed("sheets"):
+                response = spreadsheet.values_batch_get(
+                    [a1_range(title, cells) for cells in URL_COLUMNS],
+                    params={"majorDimension": "COLUMNS"},
+                )
+        except Exception as e:
+            debug += f"Error reading tab '{title}': {e}\n"
+            raise ValueError(f"Unable to read the '{title}' tab.") from e
 
-            start_row_index = 3  # This is the actual Google Sheet row number where data starts (after skipping headers)
+        columns = [
+            (value_range.get("values") or [[]])[0]
+            for value_range in response.get("valueRanges", [])
+        ]
 
-            # Extract URLs and metadata with the real worksheet row number
-            urls = [
-                {
-                    "url": row[0].strip(),                    # Column A (URL)
-                    "before_completed": row[12].strip(),      # Column M (index 12)
-                    "after_completed": row[24].strip(),       # Column Y (index 24)
-                    "row_no": start_row_index + i             # Google Sheets row number
-                }
-                for i, row in enumerate(data_rows)            # <-- FIXED: you need `enumerate()` here
-                if len(row) > 24 and row[0].strip()           # Only include rows with enough columns and a non-empty URL
-            ]
-
-        # End for loop
+        urls = list(iter_url_rows(*columns))
 
         if not urls:
             debug += "No URLs found in the worksheet.\n"
@@ -114,127 +124,169 @@ def get_urls(sheet_id: str) -> dict:
     except Exception as e:
         return {"error": str(e), "debug": debug}
 
-def load_sheet(sheet_id: str, urls_to_analyze = [], client_name = '') -> dict:
+# Tab title -> handler(worksheet, urls_to_analyze, client_name, sheet_id, progress).
+# Handlers are independent and I/O bound, so load_sheet runs them concurrently;
+# the concurrency governor still caps calls per endpoint across all of them.
+TAB_HANDLERS = {
+    SITE_SPEED_TAB: lambda ws, urls, client, sid, progress: load_site_speed_asset_optimization(ws, urls, client, sid, progress),
+    BAD_LINKS_TAB: lambda ws, urls, client, sid, progress: load_bad_links(ws, urls, sid, progress),
+    "Internal Linking Improvements": lambda ws, urls, client, sid, progress: load_internal_linking(ws, urls, sid, progress),
+    "Crawl & Indexing Optimization": lambda ws, urls, client, sid, progress: load_crawl_indexing(client, sid, progress),
+}
+
+# Comma separated tab titles to run (default: every tab with a handler)
+LOAD_SHEET_TABS = [t.strip() for t in os.getenv("LOAD_SHEET_TABS", ",".join(TAB_HANDLERS)).split(",") if t.strip()]
+# Tabs processed at the same time
+LOAD_SHEET_TAB_WORKERS = int(os.getenv("LOAD_SHEET_TAB_WORKERS", "4"))
+
+def run_tab(title, worksheet, urls_to_analyze, client_name, sheet_id, progress=NO_PROGRESS) -> dict:
     """
-    Loads all tabs in the Google Sheet into a dictionary of pandas DataFrames.
-    Includes debug output to confirm correct data types.
+    Run one tab handler, isolating its failures from the other tabs.
+
+    Returns:
+        dict: {"title", "status", "seconds", "debug", "error"?}
+    """
+    print(f"Exec: {title}")
+    started = time.monotonic()
+    try:
+        progress.stage(None, "started", title)
+        result = TAB_HANDLERS[title](worksheet, urls_to_analyze, client_name, sheet_id, progress) or {}
+    except Exception as e:
+        result = {"error": str(e), "debug": traceback.format_exc()}
+
+    status = {
+        "title": title,
+        "status": "error" if "error" in result else "success",
+        "seconds": round(time.monotonic() - started, 2),
+        "debug": result.get("debug", ""),
+    }
+    if "error" in result:
+        status["error"] = result["error"]
+    print(f"Done: {title} ({status['status']}, {status['seconds']}s)")
+    progress.tab_done(status)
+    return status
+# End run_tab
+
+def load_sheet(sheet_id: str, urls_to_analyze = [], client_name = '', on_tab_done = None, progress = NO_PROGRESS) -> dict:
+    """
+    Runs the handler of every known tab in the Google Sheet, concurrently.
+    A failing tab does not stop the others; per-tab status and timing are
+    returned under "tabs". on_tab_done(status, done, total) is called as each
+    tab finishes; `progress` receives per-URL stage events from the handlers.
     """
     try:
         debug = ""
         print(f"Executing load_sheet for sheet_id: {sheet_id}\n")        
-        # Authenticate and connect to Google Sheets
-        try:
-            creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        except Exception as cred_err:
-            print(f"Error loading credentials: {cred_err}\n")
-            raise
+        if is_local():
+            # Results go to the local store only; `python storage.py sync` exports them
+            tabs = [(title, None) for title in LOCAL_TABS]
+        else:
+            # Reuses the credentials, client and spreadsheet metadata cached by get_urls
+            try:
+                spreadsheet = open_spreadsheet(sheet_id)
+            except Exception as e:
+                print(f"Error opening spreadsheet: {traceback.format_exc()}\n")
+                raise
 
-        try:
-            client = gspread.authorize(creds)
-        except Exception as client_err:
-            print(f"Error authorizing Client: {client_err}\n")
-            raise
+            print(f"Spreadsheet '{spreadsheet.title}' loaded successfully.\n")
 
-        try:
-            spreadsheet = client.open_by_key(sheet_id)        
-        except Exception as e:
-            print(f"Error opening spreadsheet: {traceback.format_exc()}\n")
-            raise
-            
-        print(f"Spreadsheet '{spreadsheet.title}' loaded successfully.\n")
+            tabs = [(worksheet.title, worksheet) for worksheet in get_worksheets(sheet_id)]
 
-        # Loop through all tabs/worksheets
-        for worksheet in spreadsheet.worksheets():
-            title = worksheet.title
+        tabs = [(title, worksheet) for title, worksheet in tabs if title in TAB_HANDLERS and title in LOAD_SHEET_TABS]
+        for title, _ in tabs:
             print(f"Tab: {title}")
-            if title == "Site Speed & Asset Optimization":
-                print("Exec: load_site_speed_asset_optimization()")
-                #result = load_site_speed_asset_optimization(worksheet, urls_to_analyze, client_name)
-                #debug += result.get("debug", "")
-
-            if title == "Bad Links":
-                print("Exec: load_bad_link()")
-                #result = load_bad_links(worksheet, urls_to_analyze)
-                #debug += result.get("debug", "")
-            # End if
-
-            if title == "Internal Linking Improvements":
-                print("Exec: analyze_page_internal_links()")
-                #result = analyze_page_internal_links(worksheet, urls_to_analyze)
-                #debug += result.get("debug", "")
-            # End if
-
-            if title == "Crawl & Indexing Optimization":
-                print("Exec: check_canonical_tags()")
-                result = check_canonical_tags()
-                debug += result.get("debug", "")
-            # End if
 
-        # End for loop
-
-        return {"debug": debug}
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, LOAD_SHEET_TAB_WORKERS), thread_name_prefix="tab") as pool:
+            futures = [
+                pool.submit(bind_tenant(run_tab), title, worksheet, urls_to_analyze, client_name, sheet_id, progress)
+                for title, worksheet in tabs
+            ]
+            if on_tab_done:
+                for done, future in enumerate(as_completed(futures), 1):
+                    on_tab_done(future.result(), done, len(futures))
+            # Collected in tab order so the debug output reads like a sequential run
+            tab_status = [future.result() for future in futures]
+
+        # Flush-on-finish: everything the tabs queued is on the sheet before we return
+        write_errors = write_queue.flush(sheet_id)
+        for error in write_errors:
+            debug += f"Sheet write failed: {error}\n"
+
+        for status in tab_status:
+            debug += status["debug"]
+        debug += f"Tabs finished in {time.monotonic() - started:.2f}s:\n"
+        for status in tab_status:
+            line = f"  {status['title']}: {status['status']} ({status['seconds']}s)"
+            if "error" in status:
+                line += f" - {status['error']}"
+            debug += line + "\n"
+
+        governor_debug = format_governor_report()
+        print(governor_debug)
+        debug += governor_debug
+        debug += format_queue_report()
+        debug += f"LLM cache: {cache_metrics()}\n"
+        debug += format_backend_stats()
+
+        return {"debug": debug, "tabs": tab_status}
 
     except Exception as e:
         return {"error": str(e), "debug": debug}
 
-def load_site_speed_asset_optimization(worksheet, urls_to_analyze, client_name) -> dict:
+def load_site_speed_asset_optimization(worksheet, urls_to_analyze, client_name, sheet_id='', progress=NO_PROGRESS) -> dict:
     """
     Analyze site speed optimization sheet.
     Returns a summary string of processed data.
+    Results are always recorded in the local store; with worksheet=None
+    (local backend) the sheet is not touched and rows stay unsynced.
     """
 
+    debug = ""
     try:
-        title = worksheet.title
+        title = worksheet.title if worksheet else SITE_SPEED_TAB
 
         print(f"Executing load_site_speed_asset_optimization for worksheet: {title}\n")
         print(f"Client Name: {client_name}")
         print(f"URLs: {urls_to_analyze}")
 
-        insights_data = []
+        url_jobs = []
 
         base_url = ""  # Replace with your base URL if needed
         for url_info in urls_to_analyze:
             url, before_completed, after_completed, row_no = url_info["url"], url_info["before_completed"], url_info["after_completed"], url_info["row_no"]
-            try:
-                if base_url == "":
-                    # Extract base URL from the first URL in the list
-                    base_url = url
-                    if base_url.startswith("http://"):
-                        base_url = base_url.replace("http://", "https://")
-                    elif not base_url.startswith("https://"):
-                        base_url = "https://" + base_url
-
-                    url = base_url
-                else:
-                    url = base_url + '/' + url
-                
-                #print(f"Checking URL: {url}")  
-                if(before_completed == 'TRUE' and after_completed == 'TRUE'): continue  
-
-                result = analyze_both(url, before_completed, row_no)
-                if not result:
-                    debug += f"\nNo result returned from analyze_both for URL: {url}"
-                    raise ValueError(f"No result returned from analyze_both for URL: {url}")
-
-                report = generate_seo_report(result, client_name, url)
-
-                if not report:
-                    raise ValueError("No SEO Report Generated.")
+            if base_url == "":
+                # Extract base URL from the first URL in the list
+                base_url = url
+                if base_url.startswith("http://"):
+                    base_url = base_url.replace("http://", "https://")
+                elif not base_url.startswith("https://"):
+                    base_url = "https://" + base_url
+
+                url = base_url
+            else:
+                url = base_url + '/' + url
+
+            #print(f"Checking URL: {url}")
+            if(before_completed == 'TRUE' and after_completed == 'TRUE'): continue
+
+            url_jobs.append({"url": url, "before_completed": before_completed, "row_no": row_no})
+        # End for loop
 
-                # Add the report afterward
-                result["report"] = report
+        # PSI and report generation run as overlapping stages; entries keep their row_no
+        insights_data = run_site_speed_pipeline(url_jobs, client_name, progress)
 
-                insights_data.append(result)
+        for entry in insights_data:
+            if "error" in entry:
+                debug += f"\n{entry['url']} (row {entry['row_no']}): {entry['error']}"
 
-            except Exception as e:
-                insights_data.append({"url": url, "error": str(e)})
-        
         print(insights_data)
 
         try:
 
-            # === Step 2: Prepare DataFrame ===
-            records = []
+            # === Step 2: Collect every row update for one values.batchUpdate ===
+            updates = []
+            stored = []
             today = datetime.today().strftime('%m/%d/%Y')
 
             for entry in insights_data:
@@ -252,58 +304,69 @@ def load_site_speed_asset_optimization(worksheet, urls_to_analyze, client_name)
 
                 if before_mobile and before_desktop:
 
-                    record = {
-                        "Date Reviewed": today,
-                        "Core Web Vital Assestment (before)": before_mobile.get('pass_fail_status', None),
-                        "Performance (before)": before_mobile.get('performance', None),
-                        "Accessibility (before)": before_mobile.get('accessibility', None),
-                        "Best Practices (before)": before_mobile.get('best_practices', None),
-                        "SEO (before)": before_mobile.get('seo', None),
-                        "Performance (before)_D": before_desktop.get('performance', None),
-                        "Accessibility (before)_D": before_desktop.get('accessibility', None),
-                        "Best Practices (before)_D": before_desktop.get('best_practices', None),
-                        "SEO (before)_D": before_desktop.get('seo', None),
-                        "Recomendations": report,
-                        "Completed": True
-                    }
-
-                    #records.append(record)
-
-                    df = pd.DataFrame([record])
-                    range = [f"B{row_no}:M{row_no}"]
-                    print(f"Range: {range}")
-                    # Clear existing data
-                    worksheet.batch_clear([f"B{row_no}:N{row_no}"])
-
-                    set_with_dataframe(worksheet, df, row=row_no, col=2, include_column_header=False)
+                    record = [
+                        today,                                          # Date Reviewed
+                        before_mobile.get('pass_fail_status', None),    # Core Web Vital Assestment (before)
+                        before_mobile.get('performance', None),         # Performance (before)
+                        before_mobile.get('accessibility', None),       # Accessibility (before)
+                        before_mobile.get('best_practices', None),      # Best Practices (before)
+                        before_mobile.get('seo', None),                 # SEO (before)
+                        before_desktop.get('performance', None),        # Performance (before)_D
+                        before_desktop.get('accessibility', None),      # Accessibility (before)_D
+                        before_desktop.get('best_practices', None),     # Best Practices (before)_D
+                        before_desktop.get('seo', None),                # SEO (before)_D
+                        report,                                         # Recomendations
+                        True,                                           # Completed
+                        "",                                             # N is cleared, as before
+                    ]
+
+                    # B..M written, B..N cleared
+                    cells = f"B{row_no}:N{row_no}"
+                    stage = "before"
 
                 else: 
 
-                    record = {
-                        "Date Reviewed": today,
-                        "Core Web Vital Assestment (after)": after_mobile.get('pass_fail_status', None),
-                        "Performance (after)": after_mobile.get('performance', None),
-                        "Accessibility (after)": after_mobile.get('accessibility', None),
-                        "Best Practices (after)": after_mobile.get('best_practices', None),
-                        "SEO (after)": after_mobile.get('seo', None),
-                        "Performance (after)_D": after_desktop.get('performance', None),
-                        "Accessibility (after)_D": after_desktop.get('accessibility', None),
-                        "Best Practices (after)_D": after_desktop.get('best_practices', None),
-                        "SEO (after)_D": after_desktop.get('seo', None),
-                        "Recomendations": report,
-                        "Completed": True
-                    }
-
-                    df = pd.DataFrame([record])
-                    range = [f"N{row_no}:Y{row_no}"]
-                    print(f"Range: {range}")
-                    # Clear existing data
-                    worksheet.batch_clear([f"N{row_no}:Y{row_no}"])
-
-                    set_with_dataframe(worksheet, df, row=row_no, col=14, include_column_header=False)
-
-            apply_asset_optimization_formatting(worksheet)
-
+                    record = [
+                        today,                                          # Date Reviewed
+                        after_mobile.get('pass_fail_status', None),     # Core Web Vital Assestment (after)
+                        after_mobile.get('performance', None),          # Performance (after)
+                        after_mobile.get('accessibility', None),        # Accessibility (after)
+                        after_mobile.get('best_practices', None),       # Best Practices (after)
+                        after_mobile.get('seo', None),                  # SEO (after)
+                        after_desktop.get('performance', None),         # Performance (after)_D
+                        after_desktop.get('accessibility', None),       # Accessibility (after)_D
+                        after_desktop.get('best_practices', None),      # Best Practices (after)_D
+                        after_desktop.get('seo', None),                 # SEO (after)_D
+                        report,                                         # Recomendations
+                        True,                                           # Completed
+                    ]
+
+                    # N..Y written and cleared
+                    cells = f"N{row_no}:Y{row_no}"
+                    stage = "after"
+
+                print(f"Range: {cells}")
+                # None becomes an empty cell, like the cleared range did before
+                values = ["" if value is None else value for value in record]
+                updates.append({"range": a1_range(title, cells), "values": [values]})
+                stored.append({
+                    "row_no": row_no, "url": url, "stage": stage, "audit_date": today,
+                    "report": report, "cells": cells, "values": values,
+                    **dict(zip(SITE_SPEED_COLUMNS, record[1:10])),
+                })
+
+            store = get_store()
+            ids = store.save_site_speed(sheet_id, stored, synced=False)
+            for row in stored:
+                store.mark_completed(sheet_id, row["row_no"], row["stage"])
+            if worksheet is not None:
+                # Written behind the analysis in one batched request; rows are
+                # marked synced once they reach the sheet
+                write_queue.enqueue(worksheet.spreadsheet, updates, on_flushed=lambda: store.mark_site_speed_synced(ids))
+                write_queue.enqueue_call(worksheet.spreadsheet.id, lambda: apply_asset_optimization_formatting(worksheet), "Site Speed formatting")
+
+            if worksheet is None:
+                debug += f"Saved {len(stored)} Site Speed rows to the local store.\n"
             print("✅ Data written successfully.")
             
         except Exception as e:
@@ -315,21 +378,24 @@ def load_site_speed_asset_optimization(worksheet, urls_to_analyze, client_name)
 
         print("Google Sheet updated successfully.")
 
+        return {"status": "success", "debug": debug}
 
     except Exception as e:
         return {"error": str(e), "debug": debug}
     
 # End load_site_speed_asset_optimization
 
-def load_bad_links(worksheet, urls_to_analyze) -> dict:
+def load_bad_links(worksheet, urls_to_analyze, sheet_id='', progress=NO_PROGRESS) -> dict:
     """
     Analyze site speed optimization sheet.
     Returns a summary string of processed data.
+    With worksheet=None (local backend) results are kept in the local store only.
     """
     print(f"urls_to_analyze: {urls_to_analyze}")
+    debug = ""
     try:
-        debug = f"Executing load_bad_links for worksheet: {worksheet.title}\n"
-        title = worksheet.title
+        title = worksheet.title if worksheet else BAD_LINKS_TAB
+        debug = f"Executing load_bad_links for worksheet: {title}\n"
         debug += f"📄 Loading tab: {title}"
     
         # Get all values from the worksheet as raw rows (lists of lists)
@@ -343,6 +409,9 @@ def load_bad_links(worksheet, urls_to_analyze) -> dict:
 
         # Loop through urls_to_analyze and execute check_inpage_urls(url)
         results = []
+        checked_pages = set()  # Pages whose links were all checked in this run
+        link_status = {}       # Link -> HTTP status, so each link is requested once per run
+        progress.add_total(len(urls_to_analyze), title)
         base_url = ""  # Replace with your base URL if needed
         for item in urls_to_analyze:
             try:
@@ -359,12 +428,19 @@ def load_bad_links(worksheet, urls_to_analyze) -> dict:
                     url = base_url + '/' + item['url']
                 
                 #print(f"Checking URL: {url}")          
-                result = check_inpage_urls(url)
+                progress.stage(url, "links", title)
+                result = check_inpage_urls(url, link_status)
 
                 results.append(result)
+                if isinstance(result, list):
+                    checked_pages.add(url)
+                    progress.item_done(url, title)
+                else:
+                    progress.item_done(url, title, error=(result or {}).get("error", "Link check failed"))
 
             except Exception as e:
                 results.append({"url": url, "error": str(e)})
+                progress.item_done(url, title, error=e)
         
         # End for loop
         # print(results)
@@ -372,29 +448,37 @@ def load_bad_links(worksheet, urls_to_analyze) -> dict:
             
             print('Flatten the nested list')
             # Flatten the nested list
-            flat_data = [item for sublist in results for item in sublist]
-
-            print('Convert to DataFrame')
-            # Convert to DataFrame
-            #df = pd.DataFrame(urls, columns=["Page URL"])
-            headers = ["page_url", "audit_date", "in_page_url", "status_code", "tag", "Notes"]
-            df = pd.DataFrame(flat_data, columns=headers)
-
-            print('Clear existing data')
-            # Clear existing data
-            worksheet.clear()
+            flat_data = [item for sublist in results if isinstance(sublist, list) for item in sublist]
+
+            store = get_store()
+            store.save_bad_links(sheet_id, flat_data, synced=False)
+            if worksheet is None:
+                debug += f"Saved {len(flat_data)} Bad Links rows to the local store.\n"
+                return {"status": "success", "debug": debug}
+
+            # Read the existing table once and upsert by (page_url, in_page_url);
+            # the Notes column of existing rows is never written
+            with governed("sheets"):
+                response = worksheet.spreadsheet.values_batch_get([a1_range(title, "A1:E")])
+            existing = (response.get("valueRanges") or [{}])[0].get("values", [])
+
+            plan = plan_bad_links_upsert(existing, flat_data, checked_pages, datetime.today().strftime('%m/%d/%Y'))
+            updates = [{"range": a1_range(title, cells), "values": values} for cells, values in plan["ranges"]]
+
+            debug += (
+                f"Bad Links: {plan['new']} new, {plan['changed']} changed, "
+                f"{plan['resolved']} resolved, {plan['unchanged']} unchanged\n"
+            )
 
-            print('Set With Dataframe')
-            set_with_dataframe(worksheet, df, row=1, col=1, include_column_header=True)
+            # One batched update, queued behind the analysis; load_sheet flushes before returning.
+            # Rows are marked synced once they reach the sheet
+            keys = [(row["page_url"], row["in_page_url"]) for row in flat_data]
+            write_queue.enqueue(worksheet.spreadsheet, updates, on_flushed=lambda: store.mark_bad_links_synced(sheet_id, keys))
+            write_queue.enqueue_call(worksheet.spreadsheet.id, lambda: apply_bad_links_formatting(worksheet), "Bad Links formatting")
 
-            print('Apply Formatting')
-            apply_bad_links_formatting(worksheet)
-                    
         except Exception as e:
             print("Error writing to Google Sheet:", e)
             raise
-        # Write the DataFrame to the worksheet
-        
 
         print("Google Sheet updated successfully.")
 
@@ -405,50 +489,113 @@ def load_bad_links(worksheet, urls_to_analyze) -> dict:
     
 # End load_bad_links
 
-def apply_bad_links_formatting(worksheet) :
+def load_internal_linking(worksheet, urls_to_analyze, sheet_id='', progress=NO_PROGRESS) -> dict:
+    """
+    Analyze internal linking of every URL and record the results in the local store.
+    """
+    results = analyze_page_internal_links(worksheet, urls_to_analyze, progress)
+    audit_date = datetime.today().strftime('%m/%d/%Y')
+    get_store().save_internal_links(sheet_id, [dict(result, audit_date=audit_date) for result in results])
+    return {"status": "success", "debug": f"Saved {len(results)} Internal Linking rows to the local store.\n"}
+# End load_internal_linking
 
-    debug = "Applying Bad Links Formating"
-    try: 
-        # Define formatting rules
-        range_d = GridRange.from_a1_range('D1:D', worksheet)
-
-        rule_green = ConditionalFormatRule(
-            ranges=[range_d],
-            booleanRule=BooleanRule(
-                condition=BooleanCondition('NUMBER_EQ', ['200']),
-                format=CellFormat(backgroundColor=Color(0.8, 1, 0.8))
-            )
-        )
+def load_crawl_indexing(client_name, sheet_id='', progress=NO_PROGRESS) -> dict:
+    """
+    Check the canonical tags of every sitemap page and record them in the local store.
+    """
+    result = check_canonical_tags(client_name, progress)
+    rows = result.pop("rows", [])
+    get_store().save_canonical_tags(sheet_id, rows)
+    result["debug"] += f"Saved {len(rows)} canonical tag rows to the local store.\n"
+    return result
+# End load_crawl_indexing
+
+BAD_LINKS_HEADERS = ["page_url", "audit_date", "in_page_url", "status_code", "tag", "Notes"]
+# Status written over a link that was not found again on a page checked in this run
+RESOLVED_STATUS = "RESOLVED"
+
+def plan_bad_links_upsert(existing, results, checked_pages, today) -> dict:
+    """
+    Work out the Bad Links cells to write, keyed on (page_url, in_page_url).
 
-        rule_yellow = ConditionalFormatRule(
-            ranges=[range_d],
-            booleanRule=BooleanRule(
-                condition=BooleanCondition('NUMBER_EQ', ['301']),
-                format=CellFormat(backgroundColor=Color(1, 1, 0.6))
-            )
-        )
+    Args:
+        existing (list): Current rows of A1:E, header included.
+        results (list): check_inpage_urls rows from this run.
+        checked_pages (set): page_url values checked in this run; only their
+            links can be marked resolved.
 
-        rule_red = ConditionalFormatRule(
-            ranges=[range_d],
-            booleanRule=BooleanRule(
-                condition=BooleanCondition('CUSTOM_FORMULA', ['=AND(ISNUMBER(D1), D1<>200, D1<>301)']),
-                format=CellFormat(backgroundColor=Color(1, 0.8, 0.8))
-            )
-        )
+    Returns:
+        dict: {"ranges": [(cells, values)], "new", "changed", "resolved", "unchanged"}
+    """
+    ranges = []
+    counts = {"new": 0, "changed": 0, "resolved": 0, "unchanged": 0}
+
+    if not existing:
+        ranges.append(("A1:F1", [BAD_LINKS_HEADERS]))
+        existing = [BAD_LINKS_HEADERS[:5]]
+
+    index = {}
+    for offset, row in enumerate(existing[1:]):
+        row = list(row) + [""] * (5 - len(row))
+        if row[0]:
+            index[(row[0], row[2])] = (offset + 2, row)
+
+    seen = set()
+    new_rows = []
+    for result in results:
+        key = (result.get("page_url"), result.get("in_page_url"))
+        if key in seen:
+            continue
+        seen.add(key)
+        status = "" if result.get("status_code") is None else str(result.get("status_code"))
+        tag = result.get("tag") or ""
+        if key in index:
+            row_no, row = index[key]
+            if (str(row[3]), row[4]) == (status, tag):
+                counts["unchanged"] += 1
+                continue
+            ranges.append((f"B{row_no}:E{row_no}", [[result.get("audit_date") or today, key[1], status, tag]]))
+            counts["changed"] += 1
+        else:
+            new_rows.append([key[0], result.get("audit_date") or today, key[1], status, tag, result.get("notes") or ""])
+
+    for key, (row_no, row) in index.items():
+        if key in seen or key[0] not in checked_pages or row[3] == RESOLVED_STATUS:
+            continue
+        ranges.append((f"B{row_no}:D{row_no}", [[today, key[1], RESOLVED_STATUS]]))
+        counts["resolved"] += 1
+
+    if new_rows:
+        first = len(existing) + 1
+        ranges.append((f"A{first}:F{first + len(new_rows) - 1}", new_rows))
+        counts["new"] = len(new_rows)
+
+    return dict(counts, ranges=ranges)
+# End plan_bad_links_upsert
+
+# Conditional format rules, declared once. Only rules on these ranges are
+# managed; any other rule on the sheet is left alone.
+BAD_LINKS_FORMAT_RULES = [
+    {"ranges": ["D1:D"], "condition": ("NUMBER_EQ", ["200"]), "color": (0.8, 1, 0.8)},
+    {"ranges": ["D1:D"], "condition": ("NUMBER_EQ", ["301"]), "color": (1, 1, 0.6)},
+    {"ranges": ["D1:D"], "condition": ("CUSTOM_FORMULA", ["=AND(ISNUMBER(D1), D1<>200, D1<>301)"]), "color": (1, 0.8, 0.8)},
+    {"ranges": ["D1:D"], "condition": ("TEXT_EQ", ["TOXIC"]), "color": (1, 0.647, 0.0)},
+]
+
+ASSET_OPTIMIZATION_FORMAT_RULES = [
+    {"ranges": ["D3:K", "P3:W"], "condition": ("NUMBER_BETWEEN", ["90", "100"]), "color": (0.8, 1, 0.8)},
+    {"ranges": ["D3:K", "P3:W"], "condition": ("NUMBER_BETWEEN", ["50", "89"]), "color": (1, 1, 0.6)},
+    {"ranges": ["D3:K", "P3:W"], "condition": ("NUMBER_BETWEEN", ["0", "49"]), "color": (1, 0.8, 0.8)},
+    {"ranges": ["C3:C", "O3:O"], "condition": ("TEXT_EQ", ["PASS"]), "color": (0.8, 1, 0.8)},
+    {"ranges": ["C3:C", "O3:O"], "condition": ("TEXT_EQ", ["FAIL"]), "color": (1, 0.8, 0.8)},
+]
 
-        rule_orange = ConditionalFormatRule(
-            ranges=[range_d],
-            booleanRule=BooleanRule(
-                condition=BooleanCondition('TEXT_EQ', ['TOXIC']),
-                format=CellFormat(backgroundColor=Color(1, 0.647, 0.0))
-            )
-        )
+def apply_bad_links_formatting(worksheet) :
 
-        # Apply rules
-        rules = get_conditional_format_rules(worksheet)
-        rules.clear()
-        rules.extend([rule_green, rule_yellow, rule_red, rule_orange])
-        rules.save()
+    debug = "Applying Bad Links Formating\n"
+    try: 
+        result = ensure_conditional_formats(worksheet, BAD_LINKS_FORMAT_RULES)
+        debug += result["debug"]
 
         return {"debug": debug}
     
@@ -458,65 +605,13 @@ def apply_bad_links_formatting(worksheet) :
 
 def apply_asset_optimization_formatting(worksheet) :
 
-    debug = "Applying Asset Optimization Formatting"
+    debug = "Applying Asset Optimization Formatting\n"
     try: 
-
-        # Define ranges
-        range_1 = GridRange.from_a1_range('D3:K', worksheet)
-        range_2 = GridRange.from_a1_range('P3:W', worksheet)
-
-        rule_green = ConditionalFormatRule(
-            ranges=[range_1, range_2],
-            booleanRule=BooleanRule(
-                condition=BooleanCondition('NUMBER_BETWEEN', ['90', '100']),
-                format=CellFormat(backgroundColor=Color(0.8, 1, 0.8))
-            )
-        )
-
-        rule_yellow = ConditionalFormatRule(
-            ranges=[range_1, range_2],
-            booleanRule=BooleanRule(
-                condition=BooleanCondition('NUMBER_BETWEEN', ['50', '89']),
-                format=CellFormat(backgroundColor=Color(1, 1, 0.6))
-            )
-        )
-
-        rule_red = ConditionalFormatRule(
-            ranges=[range_1, range_2],
-            booleanRule=BooleanRule(
-                condition=BooleanCondition('NUMBER_BETWEEN', ['0', '49']),
-                format=CellFormat(backgroundColor=Color(1, 0.8, 0.8))
-            )
-        )
-
-        # Create GridRange from A1 notation
-        range_c = GridRange.from_a1_range('C3:C', worksheet)
-        range_d = GridRange.from_a1_range('O3:O', worksheet)
-
-        rule_pass = ConditionalFormatRule(
-            ranges=[range_c,range_d],
-            booleanRule=BooleanRule(
-                condition=BooleanCondition('TEXT_EQ', ['PASS']),
-                format=CellFormat(backgroundColor=Color(0.8, 1, 0.8))
-            )
-        )
-
-        rule_fail = ConditionalFormatRule(
-            ranges=[range_c, range_d],
-            booleanRule=BooleanRule(
-                condition=BooleanCondition('TEXT_EQ', ['FAIL']),
-                format=CellFormat(backgroundColor=Color(1, 0.8, 0.8))
-            )
-        )
-
-        # Apply rules
-        rules = get_conditional_format_rules(worksheet)
-        rules.clear()
-        rules.extend([rule_green, rule_yellow, rule_red, rule_pass, rule_fail])
-        rules.save()
+        result = ensure_conditional_formats(worksheet, ASSET_OPTIMIZATION_FORMAT_RULES)
+        debug += result["debug"]
 
         return {"debug": debug}
     
     # End try-except
     except Exception as e:
-        return {"error": str(e), "debug": debug}
\ No newline at end of file
+        return {"error": str(e), "debug": debug}
@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+from concurrency_governor import governed
+
+load_dotenv()  # Load variables from .env
+
+# === CONFIGURATION ===
+SERVICE_ACCOUNT_FILE = "credentials/google_service_account.json"
+
+SHEETS_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+
+# Seconds spreadsheet handles and worksheet lists are reused before refetching.
+SHEETS_METADATA_TTL = int(os.getenv("SHEETS_METADATA_TTL", "300"))
+
+_lock = threading.RLock()
+# gspread and google-auth are imported on first use, not at import time
+_credentials = {}   # scopes -> Credentials
+_clients = {}       # scopes -> gspread.Client
+_spreadsheets = {}  # sheet_id -> (expires_at, Spreadsheet)
+_worksheets = {}    # sheet_id -> (expires_at, [Worksheet])
+
+
+def get_credentials(scopes: list = None):
+    """
+    Service-account credentials, loaded once per scope set. google-auth
+    refreshes the access token on the same object when it expires.
+    """
+    key = tuple(scopes or SHEETS_SCOPES)
+    with _lock:
+        if key not in _credentials:
+            from google.oauth2.service_account import Credentials
+            _credentials[key] = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=list(key))
+        return _credentials[key]
+
+
+def get_client(scopes: list = None):
+    """Authorized gspread client, one per scope set, reusing its HTTP session."""
+    key = tuple(scopes or SHEETS_SCOPES)
+    with _lock:
+        if key not in _clients:
+            import gspread
+            _clients[key] = gspread.authorize(get_credentials(list(key)))
+        return _clients[key]
+
+
+def open_spreadsheet(sheet_id: str):
+    """Spreadsheet handle for sheet_id, cached for SHEETS_METADATA_TTL seconds."""
+    now = time.monotonic()
+    with _lock:
+        cached = _spreadsheets.get(sheet_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    with governed("sheets"):
+        spreadsheet = get_client().open_by_key(sheet_id)
+
+    with _lock:
+        _spreadsheets[sheet_id] = (now + SHEETS_METADATA_TTL, spreadsheet)
+    return spreadsheet
+
+
+def get_worksheets(sheet_id: str) -> list:
+    """All worksheets of sheet_id, cached for SHEETS_METADATA_TTL seconds."""
+    now = time.monotonic()
+    with _lock:
+        cached = _worksheets.get(sheet_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    spreadsheet = open_spreadsheet(sheet_id)
+    with governed("sheets"):
+        worksheets = spreadsheet.worksheets()
+
+    with _lock:
+        _worksheets[sheet_id] = (now + SHEETS_METADATA_TTL, worksheets)
+    return worksheets
+
+
+def get_worksheet(sheet_id: str, title: str):
+    """Worksheet by title from the cached worksheet list, or None."""
+    for worksheet in get_worksheets(sheet_id):
+        if worksheet.title == title:
+            return worksheet
+    return None
+
+
+def invalidate(sheet_id: str = None):
+    """Drop cached metadata for one sheet (or all), e.g. after adding a tab."""
+    with _lock:
+        if sheet_id is None:
+            _spreadsheets.clear()
+            _worksheets.clear()
+        else:
+            _spreadsheets.pop(sheet_id, None)
+            _worksheets.pop(sheet_id, None)
+
+
+def a1_range(title: str, cells: str) -> str:
+    """'Sheet Title'!B3:N3 with the title quoted as the Sheets API expects."""
+    return "'{}'!{}".format(title.replace("'", "''"), cells)
+
+
+def batch_write_values(spreadsheet, data: list, value_input_option: str = "USER_ENTERED"):
+    """
+    Write many ranges in one values.batchUpdate call.
+
+    Args:
+        data (list): [{"range": "'Tab'!B3:N3", "values": [[...]]}, ...]
+    """
+    if not data:
+        return None
+    with governed("sheets"):
+        return spreadsheet.values_batch_update({
+            "valueInputOption": value_input_option,
+            "data": data,
+        })
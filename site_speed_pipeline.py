@@ -0,0 +1,97 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+from pagespeed import analyze_both
+from seo_report import generate_seo_report
+from progress import NO_PROGRESS
+from tenants import bind_tenant
+
+load_dotenv()  # Load variables from .env
+
+# Worker threads per stage. The concurrency governor still caps the real
+# number of in-flight PSI / Gemini calls; these only bound the thread pools.
+PSI_WORKERS = int(os.getenv("SITE_SPEED_PSI_WORKERS", "4"))
+LLM_WORKERS = int(os.getenv("SITE_SPEED_LLM_WORKERS", "3"))
+
+# Tab name on progress events
+PROGRESS_TAB = "Site Speed"
+
+
+def _report_stage(result: dict, client_name: str, url: str) -> dict:
+    report = generate_seo_report(result, client_name, url)
+
+    if not report:
+        raise ValueError("No SEO Report Generated.")
+
+    # Add the report afterward
+    result["report"] = report
+    return result
+
+
+def run_site_speed_pipeline(url_jobs: list, client_name: str, progress=NO_PROGRESS) -> list:
+    """
+    Run PageSpeed analysis and SEO report generation as two overlapping stages.
+
+    Each PSI result is handed to the report stage as soon as it arrives, so
+    Gemini calls for early URLs run while later URLs are still being measured.
+
+    Args:
+        url_jobs (list): dicts with "url", "before_completed" and "row_no".
+        client_name (str): Client whose prompt is used for the reports.
+        progress (ProgressTracker): Receives per-URL "psi" / "report" stage events.
+
+    Returns:
+        list: One entry per job, in input order, each carrying its "row_no".
+    """
+    insights_data = [None] * len(url_jobs)
+    started = time.monotonic()
+
+    progress.add_total(len(url_jobs), PROGRESS_TAB)
+
+    def fail(index, error):
+        job = url_jobs[index]
+        insights_data[index] = {"url": job["url"], "row_no": job["row_no"], "error": str(error)}
+        progress.item_done(job["url"], PROGRESS_TAB, error=error)
+
+    def psi_stage(job):
+        progress.stage(job["url"], "psi", PROGRESS_TAB)
+        return analyze_both(job["url"], job["before_completed"], job["row_no"])
+
+    with ThreadPoolExecutor(max_workers=PSI_WORKERS, thread_name_prefix="psi") as psi_pool, \
+         ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm") as llm_pool:
+
+        psi_futures = {
+            psi_pool.submit(bind_tenant(psi_stage), job): index
+            for index, job in enumerate(url_jobs)
+        }
+
+        report_futures = {}
+        for future in as_completed(psi_futures):
+            index = psi_futures[future]
+            url = url_jobs[index]["url"]
+            try:
+                result = future.result()
+                if not result:
+                    raise ValueError(f"No result returned from analyze_both for URL: {url}")
+            except Exception as e:
+                fail(index, e)
+                continue
+
+            result["row_no"] = url_jobs[index]["row_no"]
+            progress.stage(url, "report", PROGRESS_TAB)
+            report_futures[llm_pool.submit(bind_tenant(_report_stage), result, client_name, url)] = index
+        # End for loop
+
+        for future in as_completed(report_futures):
+            index = report_futures[future]
+            try:
+                insights_data[index] = future.result()
+                progress.item_done(url_jobs[index]["url"], PROGRESS_TAB)
+            except Exception as e:
+                fail(index, e)
+        # End for loop
+
+    print(f"Site speed pipeline: {len(url_jobs)} URLs in {time.monotonic() - started:.1f}s")
+    return insights_data
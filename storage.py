@@ -0,0 +1,507 @@
+import os
+import csv
+import sys
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()  # Load variables from .env
+
+# === CONFIGURATION ===
+# "sheets": URL lists come from Google Sheets and results are written back to it.
+# "local":  URL lists come from the local store (imported from CSV) and results
+#           stay local until sync_to_sheets() exports them in bulk.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sheets").lower()
+LOCAL_STORE_PATH = os.getenv("LOCAL_STORE_PATH", os.path.join("data", "audits.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS url_list (
+    source_id TEXT NOT NULL,
+    row_no INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    before_completed TEXT NOT NULL DEFAULT '',
+    after_completed TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (source_id, row_no)
+);
+
+CREATE TABLE IF NOT EXISTS site_speed_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_id TEXT NOT NULL,
+    row_no INTEGER NOT NULL,
+    url TEXT,
+    stage TEXT NOT NULL,
+    audit_date TEXT,
+    pass_fail TEXT,
+    performance INTEGER,
+    accessibility INTEGER,
+    best_practices INTEGER,
+    seo INTEGER,
+    performance_d INTEGER,
+    accessibility_d INTEGER,
+    best_practices_d INTEGER,
+    seo_d INTEGER,
+    report TEXT,
+    cells TEXT NOT NULL,
+    sheet_values TEXT NOT NULL,
+    synced INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_site_speed_source ON site_speed_results (source_id, synced);
+
+CREATE TABLE IF NOT EXISTS bad_links (
+    source_id TEXT NOT NULL,
+    page_url TEXT NOT NULL,
+    in_page_url TEXT NOT NULL,
+    audit_date TEXT,
+    status_code TEXT,
+    tag TEXT,
+    notes TEXT,
+    synced INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (source_id, page_url, in_page_url)
+);
+CREATE INDEX IF NOT EXISTS idx_bad_links_status ON bad_links (source_id, status_code);
+
+CREATE TABLE IF NOT EXISTS canonical_tags (
+    source_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    category TEXT,
+    status_code TEXT,
+    canonical_url TEXT,
+    issue TEXT NOT NULL DEFAULT '',
+    audit_date TEXT,
+    PRIMARY KEY (source_id, url)
+);
+CREATE INDEX IF NOT EXISTS idx_canonical_issue ON canonical_tags (source_id, issue);
+
+CREATE TABLE IF NOT EXISTS internal_links (
+    source_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    result TEXT,
+    reason TEXT,
+    internal_links INTEGER,
+    generic_anchors INTEGER,
+    recommendations TEXT,
+    audit_date TEXT,
+    PRIMARY KEY (source_id, url)
+);
+CREATE INDEX IF NOT EXISTS idx_internal_links_result ON internal_links (source_id, result);
+
+CREATE INDEX IF NOT EXISTS idx_site_speed_performance ON site_speed_results (source_id, performance);
+
+-- Bumped on every write to a result table; the dashboard's ETags derive from it
+CREATE TABLE IF NOT EXISTS result_versions (
+    source_id TEXT NOT NULL,
+    result_table TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (source_id, result_table)
+);
+"""
+
+SITE_SPEED_COLUMNS = [
+    "pass_fail", "performance", "accessibility", "best_practices", "seo",
+    "performance_d", "accessibility_d", "best_practices_d", "seo_d",
+]
+
+# Result tables browsable on the dashboard. Only the columns listed here can be
+# shown, filtered (exact match) or sorted, so they are safe to put in SQL.
+RESULT_VIEWS = {
+    "site-speed": {
+        "title": "Site Speed",
+        "table": "site_speed_results",
+        "columns": ["url", "stage", "audit_date", "pass_fail", "performance", "accessibility",
+                    "best_practices", "seo", "synced", "created_at"],
+        "filters": ["stage", "pass_fail", "synced"],
+        "search": "url",
+        "sort": "created_at",
+    },
+    "bad-links": {
+        "title": "Bad Links",
+        "table": "bad_links",
+        "columns": ["page_url", "in_page_url", "status_code", "tag", "audit_date", "notes"],
+        "filters": ["status_code", "tag"],
+        "search": "page_url",
+        "sort": "page_url",
+    },
+    "canonical": {
+        "title": "Canonical Tags",
+        "table": "canonical_tags",
+        "columns": ["url", "category", "status_code", "canonical_url", "issue", "audit_date"],
+        "filters": ["category", "status_code", "issue"],
+        "search": "url",
+        "sort": "url",
+    },
+    "internal-links": {
+        "title": "Internal Linking",
+        "table": "internal_links",
+        "columns": ["url", "result", "internal_links", "generic_anchors", "reason", "recommendations", "audit_date"],
+        "filters": ["result"],
+        "search": "url",
+        "sort": "url",
+    },
+}
+
+
+class LocalStore:
+    """
+    SQLite store for URL lists, completion flags and audit results.
+    One short-lived connection per operation, so it is safe across threads.
+    """
+
+    def __init__(self, path: str = LOCAL_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _bump(self, conn, source_id: str, table: str):
+        conn.execute(
+            "INSERT INTO result_versions VALUES (?, ?, 1) "
+            "ON CONFLICT (source_id, result_table) DO UPDATE SET version = version + 1",
+            (source_id, table),
+        )
+
+    # === URL lists ===
+
+    def import_url_csv(self, source_id: str, csv_path: str) -> int:
+        """
+        Load a URL list from CSV with a "url" column and optional
+        "before_completed", "after_completed" and "row_no" columns.
+        Rows without row_no are numbered like the sheet (data starts on row 3).
+        """
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = [
+                (
+                    source_id,
+                    int(row.get("row_no") or 3 + i),
+                    row["url"].strip(),
+                    (row.get("before_completed") or "").strip(),
+                    (row.get("after_completed") or "").strip(),
+                )
+                for i, row in enumerate(csv.DictReader(f))
+                if (row.get("url") or "").strip()
+            ]
+        with self.connect() as conn:
+            conn.execute("DELETE FROM url_list WHERE source_id = ?", (source_id,))
+            conn.executemany("INSERT INTO url_list VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def get_urls(self, source_id: str) -> list:
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT url, before_completed, after_completed, row_no FROM url_list "
+                "WHERE source_id = ? ORDER BY row_no",
+                (source_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_completed(self, source_id: str, row_no: int, stage: str):
+        column = "before_completed" if stage == "before" else "after_completed"
+        with self.connect() as conn:
+            conn.execute(
+                f"UPDATE url_list SET {column} = 'TRUE' WHERE source_id = ? AND row_no = ?",
+                (source_id, row_no),
+            )
+
+    # === Site speed results ===
+
+    def save_site_speed(self, source_id: str, rows: list, synced: bool):
+        """
+        rows: dicts with row_no, url, stage, audit_date, report, cells, values
+        (the exact sheet row) and the SITE_SPEED_COLUMNS scores.
+        Returns the ids of the inserted rows.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        sql = (
+            "INSERT INTO site_speed_results (source_id, row_no, url, stage, audit_date, "
+            + ", ".join(SITE_SPEED_COLUMNS)
+            + ", report, cells, sheet_values, synced, created_at) VALUES ("
+            + ", ".join(["?"] * (len(SITE_SPEED_COLUMNS) + 10)) + ")"
+        )
+        ids = []
+        with self.connect() as conn:
+            for row in rows:
+                cursor = conn.execute(sql, (
+                    source_id, row["row_no"], row.get("url"), row["stage"], row.get("audit_date"),
+                    *[row.get(column) for column in SITE_SPEED_COLUMNS],
+                    row.get("report"), row["cells"], json.dumps(row["values"]), int(synced), now,
+                ))
+                ids.append(cursor.lastrowid)
+            self._bump(conn, source_id, "site_speed_results")
+        return ids
+
+    def pending_site_speed(self, source_id: str) -> list:
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT id, cells, sheet_values FROM site_speed_results "
+                "WHERE source_id = ? AND synced = 0 ORDER BY id",
+                (source_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_site_speed_synced(self, ids: list):
+        with self.connect() as conn:
+            conn.executemany("UPDATE site_speed_results SET synced = 1 WHERE id = ?", [(i,) for i in ids])
+            sources = conn.execute(
+                f"SELECT DISTINCT source_id FROM site_speed_results WHERE id IN ({', '.join('?' * len(ids))})",
+                ids,
+            ).fetchall() if ids else []
+            for row in sources:
+                self._bump(conn, row["source_id"], "site_speed_results")
+
+    # === Bad links ===
+
+    def save_bad_links(self, source_id: str, rows: list, synced: bool):
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO bad_links VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        source_id, row.get("page_url"), row.get("in_page_url"), row.get("audit_date"),
+                        "" if row.get("status_code") is None else str(row.get("status_code")), row.get("tag"), row.get("notes") or "", int(synced),
+                    )
+                    for row in rows
+                ],
+            )
+            self._bump(conn, source_id, "bad_links")
+
+    def pending_bad_links(self, source_id: str) -> list:
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT page_url, audit_date, in_page_url, status_code, tag, notes FROM bad_links "
+                "WHERE source_id = ? AND synced = 0 ORDER BY page_url, in_page_url",
+                (source_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_bad_links_synced(self, source_id: str, keys: list):
+        """keys: (page_url, in_page_url) of the rows written to the sheet."""
+        with self.connect() as conn:
+            conn.executemany(
+                "UPDATE bad_links SET synced = 1 WHERE source_id = ? AND page_url = ? AND in_page_url = ?",
+                [(source_id, page_url, in_page_url) for page_url, in_page_url in keys],
+            )
+            self._bump(conn, source_id, "bad_links")
+
+    def get_bad_links(self, source_id: str) -> list:
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT page_url, audit_date, in_page_url, status_code, tag, notes FROM bad_links "
+                "WHERE source_id = ? ORDER BY page_url, in_page_url",
+                (source_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    # === Canonical tags and internal linking ===
+
+    def save_canonical_tags(self, source_id: str, rows: list):
+        """rows: dicts with url, category, status_code, canonical_url, issue, audit_date."""
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO canonical_tags VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        source_id, row["url"], row.get("category"), str(row.get("status_code")),
+                        row.get("canonical_url"), row.get("issue") or "", row.get("audit_date"),
+                    )
+                    for row in rows
+                ],
+            )
+            self._bump(conn, source_id, "canonical_tags")
+
+    def save_internal_links(self, source_id: str, rows: list):
+        """rows: results of internal_linking_checking.analyze_page_internal_link plus url and audit_date."""
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO internal_links VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        source_id, row["url"], row.get("result"), row.get("reason"),
+                        (row.get("details") or {}).get("total_internal_links_found"),
+                        (row.get("details") or {}).get("generic_anchor_count"),
+                        "\n".join((row.get("details") or {}).get("recommendations", [])),
+                        row.get("audit_date"),
+                    )
+                    for row in rows
+                ],
+            )
+            self._bump(conn, source_id, "internal_links")
+
+    # === Dashboard queries ===
+
+    def result_version(self, source_id: str, table: str) -> int:
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT version FROM result_versions WHERE source_id = ? AND result_table = ?",
+                (source_id, table),
+            ).fetchone()
+        return row["version"] if row else 0
+
+    def versions_fingerprint(self) -> str:
+        """Changes whenever any result table of any source is written."""
+        with self.connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(version), 0) FROM result_versions").fetchone()
+        return f"{count}-{total}"
+
+    def list_sources(self) -> list:
+        """Every source with stored results and its row count per result view."""
+        sources = {}
+        with self.connect() as conn:
+            for kind, view in RESULT_VIEWS.items():
+                for row in conn.execute(f"SELECT source_id, COUNT(*) AS n FROM {view['table']} GROUP BY source_id"):
+                    sources.setdefault(row["source_id"], {})[kind] = row["n"]
+        return [{"source_id": source_id, "counts": counts} for source_id, counts in sorted(sources.items())]
+
+    def query_results(self, kind: str, source_id: str, filters: dict = None, search: str = "",
+                      sort: str = "", descending: bool = False, page: int = 1, page_size: int = 50) -> dict:
+        """
+        One page of a result view, filtered and sorted in SQL.
+
+        Args:
+            kind (str): Key of RESULT_VIEWS.
+            filters (dict): Exact-match values for the view's filter columns; others are ignored.
+            search (str): Substring matched against the view's search column.
+            sort (str): Column to order by (defaults to the view's sort column).
+
+        Returns:
+            dict: {"columns", "rows", "total", "page", "pages", "page_size", "sort", "descending"}
+        """
+        view = RESULT_VIEWS[kind]
+        sort = sort if sort in view["columns"] else view["sort"]
+        page_size = max(1, min(page_size, 500))
+
+        where = ["source_id = ?"]
+        params = [source_id]
+        for column, value in (filters or {}).items():
+            if column in view["filters"] and value not in (None, ""):
+                where.append(f"{column} = ?")
+                params.append(value)
+        if search:
+            where.append(f"{view['search']} LIKE ? ESCAPE '\\'")
+            params.append("%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        where_sql = " AND ".join(where)
+
+        with self.connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {view['table']} WHERE {where_sql}", params).fetchone()[0]
+            pages = max(1, -(-total // page_size))
+            page = max(1, min(page, pages))
+            rows = conn.execute(
+                f"SELECT {', '.join(view['columns'])} FROM {view['table']} WHERE {where_sql} "
+                f"ORDER BY {sort} {'DESC' if descending else 'ASC'}, rowid LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size],
+            ).fetchall()
+
+        return {
+            "columns": view["columns"],
+            "rows": [dict(row) for row in rows],
+            "total": total,
+            "page": page,
+            "pages": pages,
+            "page_size": page_size,
+            "sort": sort,
+            "descending": descending,
+        }
+
+    def filter_values(self, kind: str, source_id: str) -> dict:
+        """Distinct values of each filter column, for the dashboard's drop-downs."""
+        view = RESULT_VIEWS[kind]
+        with self.connect() as conn:
+            return {
+                column: [
+                    row[0] for row in conn.execute(
+                        f"SELECT DISTINCT {column} FROM {view['table']} WHERE source_id = ? ORDER BY 1 LIMIT 100",
+                        (source_id,),
+                    )
+                ]
+                for column in view["filters"]
+            }
+# End LocalStore
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> LocalStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LocalStore()
+        return _store
+
+
+def is_local() -> bool:
+    return STORAGE_BACKEND == "local"
+
+
+def sync_to_sheets(source_id: str) -> dict:
+    """
+    Export locally stored results that were never written to the sheet, in
+    one values.batchUpdate, then mark them synced.
+
+    Site Speed rows go back to the cells they were computed for. Bad Links
+    rows are upserted by (page_url, in_page_url) like a sheet run does; links
+    are never marked resolved here, since the store does not know which pages
+    were checked without finding broken links.
+
+    Internal linking and canonical tag results have no sheet layout (their
+    tab handlers never wrote to the sheet), so they stay in the local store
+    and are browsed on the /results dashboard.
+    """
+    from datetime import datetime as clock
+    from concurrency_governor import governed
+    from sheets_client import open_spreadsheet, a1_range, batch_write_values
+    from sheet_loader import SITE_SPEED_TAB, BAD_LINKS_TAB, plan_bad_links_upsert
+
+    store = get_store()
+    site_speed = store.pending_site_speed(source_id)
+    bad_links = store.pending_bad_links(source_id)
+    if not site_speed and not bad_links:
+        return {"synced": 0, "debug": "Nothing to sync.\n"}
+
+    spreadsheet = open_spreadsheet(source_id)
+    debug = ""
+
+    # Later results for the same cells win, as they would have on the sheet
+    latest = {}
+    for row in site_speed:
+        latest[row["cells"]] = row
+    updates = [
+        {"range": a1_range(SITE_SPEED_TAB, row["cells"]), "values": [json.loads(row["sheet_values"])]}
+        for row in latest.values()
+    ]
+    if site_speed:
+        debug += f"Site Speed: {len(latest)} rows.\n"
+
+    if bad_links:
+        with governed("sheets"):
+            response = spreadsheet.values_batch_get([a1_range(BAD_LINKS_TAB, "A1:E")])
+        existing = (response.get("valueRanges") or [{}])[0].get("values", [])
+        plan = plan_bad_links_upsert(existing, bad_links, set(), clock.today().strftime('%m/%d/%Y'))
+        updates += [{"range": a1_range(BAD_LINKS_TAB, cells), "values": values} for cells, values in plan["ranges"]]
+        debug += f"Bad Links: {plan['new']} new, {plan['changed']} changed, {plan['unchanged']} unchanged.\n"
+
+    if updates:
+        batch_write_values(spreadsheet, updates)
+    store.mark_site_speed_synced([row["id"] for row in site_speed])
+    store.mark_bad_links_synced(source_id, [(row["page_url"], row["in_page_url"]) for row in bad_links])
+    return {"synced": len(site_speed) + len(bad_links), "debug": debug}
+
+
+if __name__ == "__main__":
+    # python storage.py import <source_id> <urls.csv>
+    # python storage.py sync <source_id>
+    if len(sys.argv) >= 4 and sys.argv[1] == "import":
+        count = get_store().import_url_csv(sys.argv[2], sys.argv[3])
+        print(f"✅ Imported {count} URLs into '{sys.argv[2]}'")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "sync":
+        print(sync_to_sheets(sys.argv[2])["debug"])
+    else:
+        print("Usage: storage.py import <source_id> <urls.csv> | sync <source_id>")
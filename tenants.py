@@ -0,0 +1,136 @@
+import os
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()  # Load variables from .env
+
+# === CONFIGURATION ===
+# Per-client policies as "client=value" lists, e.g. TENANT_WEIGHT="webeyecare=3,client2=1".
+#   TENANT_PRIORITY: queued jobs of higher-priority clients are claimed first.
+#   TENANT_WEIGHT:   share of each endpoint's capacity when clients compete for it.
+#   TENANT_MAX_JOBS: jobs of the client running at the same time, across all workers.
+#   TENANT_SITEMAP:  sitemap index crawled by the canonical tag check.
+# Clients not listed get the TENANT_DEFAULT_* values.
+TENANT_DEFAULT_PRIORITY = int(os.getenv("TENANT_DEFAULT_PRIORITY", "0"))
+TENANT_DEFAULT_WEIGHT = float(os.getenv("TENANT_DEFAULT_WEIGHT", "1"))
+TENANT_DEFAULT_MAX_JOBS = int(os.getenv("TENANT_DEFAULT_MAX_JOBS", "1"))
+
+
+def _parse_policy(name: str, cast) -> dict:
+    values = {}
+    for entry in os.getenv(name, "").split(","):
+        client, _, value = entry.partition("=")
+        if client.strip() and value.strip():
+            values[client.strip()] = cast(value.strip())
+    return values
+
+
+TENANT_PRIORITY = _parse_policy("TENANT_PRIORITY", int)
+TENANT_WEIGHT = _parse_policy("TENANT_WEIGHT", float)
+TENANT_MAX_JOBS = _parse_policy("TENANT_MAX_JOBS", int)
+TENANT_SITEMAP = _parse_policy("TENANT_SITEMAP", str)
+
+
+def tenant_policy(tenant: str) -> dict:
+    """Priority, weight and concurrent job quota of a client."""
+    return {
+        "priority": TENANT_PRIORITY.get(tenant, TENANT_DEFAULT_PRIORITY),
+        "weight": max(0.01, TENANT_WEIGHT.get(tenant, TENANT_DEFAULT_WEIGHT)),
+        "max_jobs": max(1, TENANT_MAX_JOBS.get(tenant, TENANT_DEFAULT_MAX_JOBS)),
+    }
+
+
+def tenant_sitemap(tenant: str) -> str:
+    """
+    Sitemap index URL of a client, from TENANT_SITEMAP.
+
+    MAIN_SITEMAP is only used while TENANT_SITEMAP is not set at all, for
+    single-site deployments; once it is set, every client must be listed so
+    one client's audit never crawls another client's site.
+    """
+    if TENANT_SITEMAP:
+        sitemap = TENANT_SITEMAP.get(tenant)
+    else:
+        sitemap = os.getenv("MAIN_SITEMAP")
+    if not sitemap:
+        raise ValueError(
+            f"No sitemap configured for client '{tenant}'. "
+            f"Add '{tenant}=<sitemap url>' to TENANT_SITEMAP in your .env file."
+        )
+    return sitemap
+
+
+# === Current tenant ===
+# Set by the job worker for the duration of a run; governed calls read it to
+# share endpoint capacity between clients.
+_local = threading.local()
+
+
+def current_tenant():
+    return getattr(_local, "tenant", None)
+
+
+@contextmanager
+def tenant_scope(tenant):
+    previous = current_tenant()
+    _local.tenant = tenant
+    try:
+        yield
+    finally:
+        _local.tenant = previous
+
+
+def bind_tenant(fn):
+    """
+    Wrap fn so it runs as the calling thread's tenant. Needed for work handed
+    to thread pools, whose threads do not inherit it:
+
+        pool.submit(bind_tenant(run_tab), title, ...)
+    """
+    tenant = current_tenant()
+
+    def run(*args, **kwargs):
+        with tenant_scope(tenant):
+            return fn(*args, **kwargs)
+    return run
+
+
+# === Scheduling ===
+
+def fair_share(tenant, in_use: int) -> float:
+    """Capacity a tenant uses per unit of weight; the lowest is served first."""
+    return in_use / tenant_policy(tenant)["weight"]
+
+
+def choose_job(queued: list, running: dict):
+    """
+    Pick the next job to run.
+
+    Args:
+        queued (list): (job_id, tenant) of queued jobs, oldest first.
+        running (dict): tenant -> jobs running now (all workers).
+
+    Returns:
+        The chosen job_id, or None when every tenant with queued jobs is at its quota.
+
+    Highest priority first; among equal priorities the tenant with the fewest
+    running jobs per unit of weight; within a tenant, oldest first. A client
+    with one small audit therefore starts as soon as a worker frees up, even
+    behind a long queue of another client's jobs.
+    """
+    oldest = {}
+    for job_id, tenant in queued:
+        oldest.setdefault(tenant, job_id)
+
+    candidates = [
+        tenant for tenant in oldest
+        if running.get(tenant, 0) < tenant_policy(tenant)["max_jobs"]
+    ]
+    if not candidates:
+        return None
+    tenant = min(
+        candidates,
+        key=lambda t: (-tenant_policy(t)["priority"], fair_share(t, running.get(t, 0))),
+    )
+    return oldest[tenant]
@@ -0,0 +1,50 @@
+import check_inpage_urls
+from sheet_loader import plan_bad_links_upsert, BAD_LINKS_HEADERS
+
+PAGE_HTML = '<html><body><a href="/broken">Broken</a><a href="/ok">OK</a></body></html>'
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+def test_shared_broken_link_is_reported_for_every_page(monkeypatch):
+    head_requests = []
+
+    def fake_request(endpoint, method, url, **kwargs):
+        if method == "GET":
+            return FakeResponse(200, PAGE_HTML)
+        head_requests.append(url)
+        return FakeResponse(404 if url.endswith("/broken") else 200)
+
+    monkeypatch.setattr(check_inpage_urls, "governed_request", fake_request)
+
+    pages = ["https://example.com/a", "https://example.com/b"]
+    link_status = {}
+    results = []
+    for page in pages:
+        results.extend(check_inpage_urls.check_inpage_urls(page, link_status))
+
+    # Each link is requested once per run...
+    assert sorted(head_requests) == ["https://example.com/broken", "https://example.com/ok"]
+    # ...but the broken link is reported on both pages
+    assert [(row["page_url"], row["in_page_url"]) for row in results] == [
+        ("https://example.com/a", "https://example.com/broken"),
+        ("https://example.com/b", "https://example.com/broken"),
+    ]
+
+    existing = [
+        BAD_LINKS_HEADERS,
+        ["https://example.com/a", "01/01/2025", "https://example.com/broken", "404", "a"],
+        ["https://example.com/b", "01/01/2025", "https://example.com/broken", "404", "a"],
+    ]
+    plan = plan_bad_links_upsert(existing, results, set(pages), "02/01/2025")
+
+    assert plan["resolved"] == 0
+    assert plan["unchanged"] == 2
+    assert plan["ranges"] == []
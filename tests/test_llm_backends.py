@@ -0,0 +1,40 @@
+import pytest
+import requests
+
+import llm_backends
+from llm_backends import LLMBackend, LLMBackendError, generate_report_stream
+from report_writer import stream_report_to_file
+
+
+class UnreachableBackend(LLMBackend):
+    name = "unreachable"
+
+    def complete(self, prompt, timeout):
+        raise requests.ConnectionError("connection refused")
+
+
+class DroppingBackend(LLMBackend):
+    name = "dropping"
+
+    def complete(self, prompt, timeout):
+        return "", 0, 0
+
+    def stream(self, prompt, timeout, usage):
+        yield "partial "
+        raise requests.Timeout("read timed out")
+
+
+@pytest.mark.parametrize("backend", [UnreachableBackend(), DroppingBackend()])
+def test_backend_network_errors_are_not_file_errors(monkeypatch, tmp_path, backend):
+    monkeypatch.setitem(llm_backends.BACKENDS, backend.name, backend)
+
+    with pytest.raises(LLMBackendError) as raised:
+        stream_report_to_file(
+            generate_report_stream("prompt", use_cache=False, backends=[backend.name]),
+            str(tmp_path / "report.txt"),
+            "test",
+        )
+
+    # requests errors are OSErrors; report handlers must not mistake them for write failures
+    assert not isinstance(raised.value, OSError)
+    assert not (tmp_path / "report.txt").exists()
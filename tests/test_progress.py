@@ -0,0 +1,62 @@
+import check_canonical_tags
+import internal_linking_checking
+
+
+class RecordingProgress:
+    def __init__(self):
+        self.events = []
+
+    def add_total(self, count, tab=""):
+        self.events.append(("total", count, tab))
+
+    def stage(self, item, stage, tab=""):
+        self.events.append((stage, item, tab))
+
+    def item_done(self, item, tab="", error=None):
+        self.events.append(("error" if error else "done", item, tab))
+
+
+def test_internal_links_report_progress_per_url(monkeypatch):
+    def analyze(url):
+        if url.endswith("broken"):
+            raise ValueError("bad page")
+        return {"result": "PASS", "reason": "", "details": {}}
+
+    monkeypatch.setattr(internal_linking_checking, "analyze_page_internal_link", analyze)
+    progress = RecordingProgress()
+    tab = internal_linking_checking.PROGRESS_TAB
+
+    results = internal_linking_checking.analyze_page_internal_links(
+        None, [{"url": "site.example"}, {"url": "broken"}], progress,
+    )
+
+    assert [r["result"] for r in results] == ["PASS", "Error"]
+    assert progress.events == [
+        ("total", 2, tab),
+        ("links", "https://site.example", tab),
+        ("done", "https://site.example", tab),
+        ("links", "https://site.example/broken", tab),
+        ("error", "https://site.example/broken", tab),
+    ]
+
+
+def test_canonical_crawl_reports_progress_per_url(monkeypatch):
+    def get_canonical(url):
+        return None if url.endswith("down") else {"href": url, "status_code": 200}
+
+    monkeypatch.setattr(check_canonical_tags, "get_canonical", get_canonical)
+    progress = RecordingProgress()
+    tab = check_canonical_tags.PROGRESS_TAB
+
+    check_canonical_tags.get_canonical_tags(
+        {"products": ["https://site.example/a", "https://site.example/down"], "pages": ["https://site.example/"]},
+        progress,
+    )
+
+    assert progress.events == [
+        ("total", 2, tab),
+        ("canonical", "https://site.example/a", tab),
+        ("done", "https://site.example/a", tab),
+        ("canonical", "https://site.example/down", tab),
+        ("error", "https://site.example/down", tab),
+    ]
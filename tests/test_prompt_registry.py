@@ -0,0 +1,13 @@
+import pytest
+
+from prompt_registry import preload_prompts, registry
+
+
+def test_preload_registers_report_prompts():
+    preload_prompts(["webeyecare"])
+    assert {"seo_report", "canonical_report"} <= set(registry._templates)
+
+
+def test_preload_raises_when_a_prompt_file_is_missing():
+    with pytest.raises(ValueError, match="no_such_client__pagespeed-audit-prompt.md"):
+        preload_prompts(["no_such_client"])
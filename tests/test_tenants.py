@@ -0,0 +1,26 @@
+import pytest
+
+import tenants
+from tenants import tenant_sitemap
+
+
+def test_sitemap_is_resolved_per_client(monkeypatch):
+    monkeypatch.setattr(tenants, "TENANT_SITEMAP", {
+        "client1": "https://client1.example/sitemap.xml",
+        "client2": "https://client2.example/sitemap.xml",
+    })
+    monkeypatch.setenv("MAIN_SITEMAP", "https://client1.example/sitemap.xml")
+
+    assert tenant_sitemap("client2") == "https://client2.example/sitemap.xml"
+    with pytest.raises(ValueError, match="client3"):
+        tenant_sitemap("client3")
+
+
+def test_main_sitemap_only_without_tenant_sitemaps(monkeypatch):
+    monkeypatch.setattr(tenants, "TENANT_SITEMAP", {})
+    monkeypatch.setenv("MAIN_SITEMAP", "https://site.example/sitemap.xml")
+    assert tenant_sitemap("client1") == "https://site.example/sitemap.xml"
+
+    monkeypatch.delenv("MAIN_SITEMAP")
+    with pytest.raises(ValueError, match="TENANT_SITEMAP"):
+        tenant_sitemap("client1")
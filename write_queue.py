@@ -0,0 +1,310 @@
+import os
+import re
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+from sheets_client import batch_write_values
+
+load_dotenv()  # Load variables from .env
+
+# === CONFIGURATION ===
+# Write requests per minute sent to one spreadsheet (Sheets allows 60/min per user).
+SHEETS_WRITES_PER_MINUTE = int(os.getenv("SHEETS_WRITES_PER_MINUTE", "50"))
+# Write requests per minute sent to a Google Doc (Docs allows 60/min per user;
+# report_to_gdoc sends every document through one target to stay within it).
+DOCS_WRITES_PER_MINUTE = int(os.getenv("DOCS_WRITES_PER_MINUTE", "60"))
+# Seconds a write may wait in the queue to be coalesced with later ones.
+WRITE_QUEUE_FLUSH_INTERVAL = float(os.getenv("WRITE_QUEUE_FLUSH_INTERVAL", "2"))
+# Max ranges per values.batchUpdate; larger backlogs are sent in several requests.
+WRITE_QUEUE_MAX_RANGES = int(os.getenv("WRITE_QUEUE_MAX_RANGES", "500"))
+
+# 'Tab'!B3:N3 or Tab!B3; single-row ranges are merged with overlapping ones
+ROW_RANGE = re.compile(r"^(.+)!\$?([A-Z]+)\$?(\d+)(?::\$?([A-Z]+)\$?(\d+))?$")
+
+
+def column_index(letters: str) -> int:
+    """A -> 1, Z -> 26, AA -> 27."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index
+
+
+def column_letters(index: int) -> str:
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def parse_row_range(a1: str, values: list):
+    """(sheet, row, first column) when a1 is one row written with one row of values, else None."""
+    match = ROW_RANGE.match(a1)
+    if not match or len(values) != 1:
+        return None
+    sheet, first, row, last, last_row = match.groups()
+    if last_row is not None and last_row != row:
+        return None
+    return sheet, int(row), column_index(first)
+
+
+class _Target:
+    """Pending writes for one spreadsheet or document."""
+
+    def __init__(self, key, per_minute):
+        self.key = key
+        self.spreadsheet = None
+        self.interval = 60.0 / max(1, per_minute)
+        self.ranges = OrderedDict()   # (value_input_option, range) -> values
+        self.rows = {}                # (value_input_option, sheet, row) -> {range: first column}
+        self.calls = []               # [(label, fn)] run after the ranges
+        self.callbacks = []           # run once everything enqueued so far is written
+        self.first_enqueued = None
+        self.next_allowed = 0.0
+        self.busy = False
+        self.errors = []
+
+    def pending(self) -> int:
+        return len(self.ranges) + len(self.calls)
+
+
+class WriteQueue:
+    """
+    Write-behind queue for Sheets and Docs mutations.
+
+    Handlers enqueue cell ranges (or opaque mutation calls) and return to
+    their analysis; a background thread flushes each target in batched
+    requests, no faster than its per-minute limit. Writes to a range that is
+    still queued replace the queued values, so only the last one is sent.
+    flush() blocks until a target is fully written and returns its errors.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._targets = {}
+        self._thread = None
+        self.stats = {"enqueued": 0, "coalesced": 0, "written_ranges": 0, "calls": 0, "requests": 0, "errors": 0}
+
+    def _target(self, key, per_minute) -> _Target:
+        target = self._targets.get(key)
+        if target is None:
+            target = self._targets[key] = _Target(key, per_minute)
+        return target
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, spreadsheet, data: list, value_input_option: str = "USER_ENTERED", on_flushed=None):
+        """
+        Queue value ranges for a spreadsheet. A queued range written again is
+        replaced; single-row ranges that overlap or touch a queued range on the
+        same row (e.g. B3:N3 then N3:Y3) are merged into one, later values
+        winning on the shared cells.
+
+        Args:
+            data (list): [{"range": "'Tab'!B3:N3", "values": [[...]]}, ...]
+            on_flushed (callable): Called after these ranges reach the sheet.
+        """
+        with self._cond:
+            target = self._target(spreadsheet.id, SHEETS_WRITES_PER_MINUTE)
+            target.spreadsheet = spreadsheet
+            for item in data:
+                self._add_range(target, value_input_option, item["range"], item["values"])
+                self.stats["enqueued"] += 1
+            if on_flushed:
+                target.callbacks.append(on_flushed)
+            if target.first_enqueued is None:
+                target.first_enqueued = time.monotonic()
+            self._start()
+            self._cond.notify_all()
+
+    def _add_range(self, target: _Target, option: str, a1: str, values: list):
+        """Queue one range on target, merging it with queued ranges on the same row. Caller holds the lock."""
+        row_range = parse_row_range(a1, values)
+        if row_range is not None:
+            sheet, row, first = row_range
+            row_key = (option, sheet, row)
+            cells = {first + offset: value for offset, value in enumerate(values[0])}
+            last = first + len(values[0]) - 1
+            queued = target.rows.setdefault(row_key, {})
+            for other, other_first in list(queued.items()):
+                other_values = target.ranges[(option, other)][0]
+                other_last = other_first + len(other_values) - 1
+                if other_first > last + 1 or other_last < first - 1:
+                    continue
+                # Earlier values first, so this write wins on shared cells
+                merged = {other_first + offset: value for offset, value in enumerate(other_values)}
+                merged.update(cells)
+                cells = merged
+                del target.ranges[(option, other)]
+                del queued[other]
+                self.stats["coalesced"] += 1
+            first, last = min(cells), max(cells)
+            a1 = f"{sheet}!{column_letters(first)}{row}:{column_letters(last)}{row}"
+            values = [[cells[column] for column in range(first, last + 1)]]
+            queued[a1] = first
+        else:
+            # Rows queued before this range must not be moved after it by a later merge
+            target.rows = {}
+
+        key = (option, a1)
+        if key in target.ranges:
+            # Re-queue at the end so it still lands after any overlapping range
+            del target.ranges[key]
+            self.stats["coalesced"] += 1
+        target.ranges[key] = values
+
+    def enqueue_call(self, key: str, fn, label: str = "", per_minute: int = None):
+        """
+        Queue a mutation that is not a value range (formatting, table rewrite,
+        Docs batchUpdate). Calls for a key run in order, after its queued ranges.
+        """
+        with self._cond:
+            target = self._target(key, per_minute or SHEETS_WRITES_PER_MINUTE)
+            target.calls.append((label or getattr(fn, "__name__", "call"), fn))
+            if target.first_enqueued is None:
+                target.first_enqueued = time.monotonic()
+            self._start()
+            self._cond.notify_all()
+
+    def _due(self, now):
+        for target in self._targets.values():
+            if target.busy or not target.pending():
+                continue
+            full = len(target.ranges) >= WRITE_QUEUE_MAX_RANGES
+            if full or now - target.first_enqueued >= WRITE_QUEUE_FLUSH_INTERVAL:
+                return target
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                target = self._due(time.monotonic())
+                if target is None:
+                    self._cond.wait(timeout=WRITE_QUEUE_FLUSH_INTERVAL / 2 or 0.5)
+                    continue
+                target.busy = True
+            self._drain(target)
+
+    def _drain(self, target: _Target):
+        """Write everything queued for `target`. Caller has set target.busy."""
+        try:
+            while True:
+                with self._cond:
+                    ranges, target.ranges = target.ranges, OrderedDict()
+                    target.rows = {}
+                    calls, target.calls = target.calls, []
+                    callbacks, target.callbacks = target.callbacks, []
+                    target.first_enqueued = None
+                    spreadsheet = target.spreadsheet
+                if not ranges and not calls:
+                    break
+
+                ok = True
+                items = list(ranges.items())
+                for start in range(0, len(items), WRITE_QUEUE_MAX_RANGES):
+                    chunk = items[start:start + WRITE_QUEUE_MAX_RANGES]
+                    by_option = OrderedDict()
+                    for (option, a1), values in chunk:
+                        by_option.setdefault(option, []).append({"range": a1, "values": values})
+                    for option, data in by_option.items():
+                        sent = self._send(target, f"{len(data)} ranges", lambda: batch_write_values(spreadsheet, data, option))
+                        if sent:
+                            with self._cond:
+                                self.stats["written_ranges"] += len(data)
+                        ok = ok and sent
+
+                for label, fn in calls:
+                    ok = self._send(target, label, fn) and ok
+                    with self._cond:
+                        self.stats["calls"] += 1
+
+                if ok:
+                    for callback in callbacks:
+                        try:
+                            callback()
+                        except Exception as e:
+                            print(f"Write queue callback failed for {target.key}: {e}")
+        finally:
+            with self._cond:
+                target.busy = False
+                self._cond.notify_all()
+
+    def _send(self, target: _Target, label: str, fn) -> bool:
+        wait = target.next_allowed - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        target.next_allowed = time.monotonic() + target.interval
+        with self._cond:
+            self.stats["requests"] += 1
+        try:
+            fn()
+            return True
+        except Exception as e:
+            print(f"Write queue: {label} for {target.key} failed: {e}")
+            with self._cond:
+                self.stats["errors"] += 1
+                target.errors.append(f"{label}: {e}")
+            return False
+
+    def flush(self, key: str = None, timeout: float = None) -> list:
+        """
+        Write everything queued for `key` (or for every target) now, still
+        under the rate limit, and wait for it. Returns the errors collected
+        for those targets since the last flush.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        errors = []
+        with self._cond:
+            keys = [key] if key is not None else list(self._targets)
+        for k in keys:
+            while True:
+                with self._cond:
+                    target = self._targets.get(k)
+                    if target is None:
+                        break
+                    if target.busy:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self._cond.wait(timeout=remaining)
+                        continue
+                    if not target.pending():
+                        errors += target.errors
+                        target.errors = []
+                        break
+                    target.busy = True
+                self._drain(target)
+        return errors
+
+    def depth(self, key: str = None) -> int:
+        """Ranges and calls waiting or being written."""
+        with self._cond:
+            if key is None:
+                targets = list(self._targets.values())
+            else:
+                targets = [self._targets[key]] if key in self._targets else []
+            return sum(t.pending() + (1 if t.busy else 0) for t in targets)
+
+    def report(self) -> dict:
+        with self._cond:
+            return dict(self.stats, depth=sum(t.pending() for t in self._targets.values()))
+# End WriteQueue
+
+
+write_queue = WriteQueue()
+atexit.register(write_queue.flush, None, 60)
+
+
+def format_queue_report() -> str:
+    r = write_queue.report()
+    return (
+        f"Write queue: depth {r['depth']}, {r['enqueued']} ranges queued ({r['coalesced']} coalesced), "
+        f"{r['written_ranges']} written, {r['calls']} calls, {r['requests']} requests, {r['errors']} errors\n"
+    )